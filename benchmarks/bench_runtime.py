@@ -0,0 +1,58 @@
+"""Memory and construction time of link runtimes at 10, 100 and 1000 links.
+
+    python benchmarks/bench_runtime.py
+"""
+import asyncio
+import gc
+import logging
+import time
+import tracemalloc
+
+from fakes import FakeHass, FakeEntry, make_link
+
+from custom_components.quick_automation.coordinator import Coordinator, BaseEntity
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, CoordinatorEntity
+
+_LOGGER = logging.getLogger(__name__)
+SIZES = (10, 100, 1000)
+
+
+def _runtime(hass, entry, links):
+    return [BaseEntity(Coordinator(hass, None, entry, link)) for link in links]
+
+
+def _legacy(hass, entry, links):
+    result = []
+    for link in links:
+        async def _update(link=link):
+            return link
+        c = DataUpdateCoordinator(hass, _LOGGER, name="Quick Automation", update_method=_update)
+        result.append(CoordinatorEntity(c))
+    return result
+
+
+def measure(factory, hass, entry, links):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = factory(hass, entry, links)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return elapsed, size
+
+
+async def main():
+    hass = FakeHass(asyncio.get_running_loop())
+    entry = FakeEntry()
+    print("%8s %12s %14s %14s %14s" % ("links", "runtime", "ms", "bytes", "bytes/link"))
+    for size in SIZES:
+        links = [make_link(x) for x in range(size)]
+        for name, factory in (("runtime", _runtime), ("legacy", _legacy)):
+            elapsed, used = measure(factory, hass, entry, links)
+            print("%8s %12s %14.2f %14s %14.0f" % (size, name, elapsed * 1000, used, used / size))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
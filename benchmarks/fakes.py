@@ -0,0 +1,297 @@
+"""Lightweight stand-ins for the parts of Home Assistant used by the benchmarks."""
+import asyncio
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_components.quick_automation.constants import DOMAIN
+from custom_components.quick_automation import coordinator, router
+from homeassistant.components import device_automation
+
+
+class FakeBus:
+
+    def __init__(self) -> None:
+        self.listeners = dict()
+
+    def async_listen(self, event_type, listener, *args, **kwargs):
+        token = object()
+        self.listeners[token] = (event_type, listener)
+        return lambda: self.listeners.pop(token, None)
+
+    def async_listen_once(self, event_type, listener, *args, **kwargs):
+        return self.async_listen(event_type, listener)
+
+
+class FakeServices:
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    async def async_call(self, domain, service, data=None, blocking=False, **kwargs):
+        self.calls.append((domain, service, data))
+
+
+class FakeStates:
+
+    def get(self, entity_id):
+        return None
+
+    def async_remove(self, entity_id, context=None):
+        return True
+
+
+class FakeEntry:
+
+    def __init__(self, entry_id: str = "bench", data: dict = None, title: str = None) -> None:
+        self.entry_id = entry_id
+        self.title = title or entry_id
+        self.data = data or {}
+
+
+class FakeConfigEntries:
+
+    def __init__(self, hass) -> None:
+        self.hass = hass
+        self.entries = dict()
+
+    def async_entries(self, domain=None):
+        return list(self.entries.values())
+
+    def async_update_entry(self, entry, data=None, **kwargs):
+        if data is not None:
+            entry.data = data
+
+    async def async_reload(self, entry_id):
+        component = self.hass.data[DOMAIN]["component"]
+        entry = self.entries[entry_id]
+        await component.unload_config_entry(entry)
+        for c in self.hass.data[DOMAIN]["entries"].pop(entry_id, {}).values():
+            c.disable()
+        await component.setup_config_entry(entry)
+
+
+class FakeConfig:
+
+    def path(self, *args):
+        return os.path.join("/nonexistent", *args)
+
+
+class FakeHass:
+
+    def __init__(self, loop=None) -> None:
+        self.loop = loop or asyncio.get_event_loop()
+        self.data = {DOMAIN: dict(entries={}, serialized={})}
+        self.bus = FakeBus()
+        self.services = FakeServices()
+        self.states = FakeStates()
+        self.config = FakeConfig()
+        self.config_entries = FakeConfigEntries(self)
+        self.is_running = True
+        self.tasks = set()
+
+    def async_create_task(self, target):
+        task = self.loop.create_task(target)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def async_block_till_done(self):
+        while len(self.tasks):
+            await asyncio.gather(*list(self.tasks), return_exceptions=True)
+
+    async def async_add_executor_job(self, target, *args):
+        return target(*args)
+
+
+class FakeStorage:
+
+    links = dict()
+
+    def __init__(self, hass, entry_id: str) -> None:
+        self.entry_id = entry_id
+
+    async def async_load(self):
+        return self.links.get(self.entry_id)
+
+    async def async_save(self, links):
+        self.links[self.entry_id] = links.as_list()
+
+    def async_schedule_save(self, links):
+        self.links[self.entry_id] = links.as_list()
+
+    async def async_remove(self):
+        self.links.pop(self.entry_id, None)
+
+
+class FakeEntity:
+
+    def __init__(self, supported_features: int) -> None:
+        self.supported_features = supported_features
+        self.device_id = None
+        self.name = None
+        self.original_name = None
+
+
+class FakeEntityRegistry:
+
+    def __init__(self) -> None:
+        self.entities = dict()
+
+    def async_get(self, entity_id):
+        return self.entities.get(entity_id)
+
+    def async_remove(self, entity_id):
+        self.entities.pop(entity_id, None)
+
+
+class FakeDevicePlatform:
+
+    def __init__(self, hass) -> None:
+        self.hass = hass
+
+    async def async_call_action_from_config(self, hass, config, variables, context):
+        hass.services.calls.append(("device", config.get("type"), config))
+
+
+class Devices:
+    """Synthetic device-automation lists plus the fake trigger/state subscription registry."""
+
+    def __init__(self, hass) -> None:
+        self.hass = hass
+        self.triggers = dict()
+        self.actions = dict()
+        self.entity_reg = FakeEntityRegistry()
+        self.state_listeners = dict()
+        self.trigger_listeners = dict()
+
+    async def async_get_device_automations(self, hass, type, device_ids):
+        source = self.triggers if type == device_automation.DeviceAutomationType.TRIGGER else self.actions
+        return {x: source.get(x, []) for x in device_ids}
+
+    async def async_get_device_automation_platform(self, hass, domain, type):
+        return FakeDevicePlatform(hass)
+
+    async def async_get_registry(self, hass):
+        return self.entity_reg
+
+    def async_track_state_change_event(self, hass, entity_ids, action):
+        token = object()
+        for entity_id in entity_ids:
+            self.state_listeners.setdefault(entity_id, dict())[token] = action
+        def _remove():
+            for entity_id in entity_ids:
+                self.state_listeners.get(entity_id, {}).pop(token, None)
+        return _remove
+
+    async def async_initialize_triggers(self, hass, triggers, action, domain, name, log_cb, **kwargs):
+        token = object()
+        for trigger in triggers:
+            key = (trigger["device_id"], trigger.get("type"), trigger.get("subtype"))
+            self.trigger_listeners.setdefault(key, dict())[token] = action
+        def _remove():
+            for trigger in triggers:
+                key = (trigger["device_id"], trigger.get("type"), trigger.get("subtype"))
+                self.trigger_listeners.get(key, {}).pop(token, None)
+        return _remove
+
+
+def install(hass) -> Devices:
+    devices = Devices(hass)
+    coordinator.device_automation = types.SimpleNamespace(
+        DeviceAutomationType=device_automation.DeviceAutomationType,
+        async_get_device_automations=devices.async_get_device_automations,
+        async_get_device_automation_platform=devices.async_get_device_automation_platform,
+    )
+    coordinator.entity_registry = types.SimpleNamespace(async_get_registry=devices.async_get_registry)
+    coordinator.LinkStorage = FakeStorage
+    router.async_track_state_change_event = devices.async_track_state_change_event
+    router.async_initialize_triggers = devices.async_initialize_triggers
+    return devices
+
+
+def make_component(hass, config: dict = None):
+    component = coordinator.Component(hass, config or {})
+    hass.data[DOMAIN]["component"] = component
+
+    async def _add_entities(entities, *args, **kwargs):
+        for entity in entities:
+            entity.hass = hass
+            await entity.async_added_to_hass()
+    component.async_add_entities = _add_entities
+    return component
+
+
+def _mqtt_trigger(device_id, subtype):
+    return dict(platform="device", domain="mqtt", device_id=device_id, type="action", subtype=subtype, discovery_id="%s action_%s" % (device_id, subtype))
+
+
+def _zha_trigger(device_id, type, subtype):
+    return dict(platform="device", domain="zha", device_id=device_id, type=type, subtype=subtype)
+
+
+MQTT_REMOTE = ["on", "off", "toggle", "brightness_move_up", "brightness_move_down", "brightness_stop", "arrow_left_click", "arrow_right_click",
+    "arrow_left_hold", "arrow_right_hold", "arrow_left_release", "arrow_right_release", "brightness_up_click", "brightness_down_click",
+    "brightness_up_hold", "brightness_down_hold", "brightness_up_release", "brightness_down_release", "toggle_hold", "single", "double"]
+ZHA_REMOTE = [
+    ("remote_button_short_press", "turn_on"), ("remote_button_short_press", "turn_off"), ("remote_button_short_press", "left"),
+    ("remote_button_short_press", "right"), ("remote_button_short_press", "dim_up"), ("remote_button_short_press", "dim_down"),
+    ("remote_button_long_press", "turn_on"), ("remote_button_long_press", "turn_off"), ("remote_button_long_press", "left"),
+    ("remote_button_long_press", "right"), ("remote_button_long_press", "dim_up"), ("remote_button_long_press", "dim_down"),
+    ("remote_button_long_release", "dim_up"), ("remote_button_long_release", "dim_down"), ("remote_button_long_release", "left"),
+    ("remote_button_long_release", "right"),
+]
+LIGHT_ACTIONS = ["toggle", "turn_on", "turn_off", "brightness_increase", "brightness_decrease", "flash"]
+
+
+def populate(devices: Devices, count: int):
+    """Register `count` remotes (alternating MQTT and ZHA) and as many lights; returns (source, destination) pairs."""
+    pairs = []
+    for idx in range(count):
+        remote = "remote_%s" % (idx)
+        if idx % 2:
+            devices.triggers[remote] = [_zha_trigger(remote, type, subtype) for type, subtype in ZHA_REMOTE]
+        else:
+            devices.triggers[remote] = [_mqtt_trigger(remote, subtype) for subtype in MQTT_REMOTE]
+        if idx % 3:
+            entity_id = "light.bench_%s" % (idx)
+            devices.entity_reg.entities[entity_id] = FakeEntity(1 | 2)
+            destination = dict(entity_id=entity_id)
+        else:
+            device_id = "light_%s" % (idx)
+            devices.actions[device_id] = [dict(domain="light", device_id=device_id, entity_id="light.device_%s" % (idx), type=x) for x in LIGHT_ACTIONS]
+            destination = dict(device_id=device_id)
+        pairs.append((dict(device_id=remote), destination))
+    return pairs
+
+
+def make_link(idx: int):
+    device_id = "remote_%s" % (idx)
+    entity_id = "light.bench_%s" % (idx)
+    def trigger(subtype):
+        return _mqtt_trigger(device_id, subtype)
+    return dict(
+        id="link%06d" % (idx),
+        name="Remote %s - Light %s" % (idx, idx),
+        enabled=True,
+        revision=1,
+        source=dict(device_id=device_id),
+        destination=dict(entity_id=entity_id),
+        config=dict(
+            on_off=dict(
+                trigger=dict(triggers=[trigger("on"), trigger("off")]),
+                action=dict(actions=[dict(entity_id=entity_id, action="turn_on"), dict(entity_id=entity_id, action="turn_off")]),
+                reverse=False, extra={}, enabled=True,
+            ),
+            brightness=dict(
+                trigger=dict(triggers=[trigger("brightness_move_up"), trigger("brightness_move_down")]),
+                action=dict(actions=[
+                    dict(entity_id=entity_id, action="turn_on", extra=dict(brightness_step_pct=10)),
+                    dict(entity_id=entity_id, action="turn_on", extra=dict(brightness_step_pct=-10)),
+                ]),
+                reverse=False, extra={}, enabled=True,
+            ),
+        ),
+    )
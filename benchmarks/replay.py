@@ -0,0 +1,107 @@
+"""Replay recorded trigger traffic against a copy of a production link set.
+
+Record traffic with the `quick_automation/record` websocket command, copy
+`.storage/quick_automation.<entry_id>` next to the capture and run:
+
+    python benchmarks/replay.py capture.jsonl.gz quick_automation.<entry_id> --speed 10
+
+Speed 0 replays as fast as possible. Service and device calls are only recorded.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+import time
+import types
+
+from fakes import FakeHass, FakeEntry, FakeStorage, install, make_component
+
+from custom_components.quick_automation.stats import Histogram
+
+
+def load_capture(path: str):
+    keys = dict()
+    events = []
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item[1] == "k":
+                keys[item[2]] = item[3]
+            elif item[1] == "t":
+                events.append((item[0], "t", keys[item[2]]))
+            else:
+                events.append((item[0], "s", item[2], item[3], item[4]))
+    return events
+
+
+def load_links(path: str):
+    with open(path) as f:
+        data = json.load(f)
+    return list(data.get("data", data).get("links", {}).values())
+
+
+async def fire(devices, event):
+    if event[1] == "s":
+        _, _, entity_id, from_state, to_state = event
+        data = dict(
+            entity_id=entity_id,
+            old_state=types.SimpleNamespace(state=from_state),
+            new_state=types.SimpleNamespace(state=to_state),
+        )
+        for action in list(devices.state_listeners.get(entity_id, {}).values()):
+            action(types.SimpleNamespace(data=data))
+    else:
+        trigger = event[2]
+        key = (trigger.get("device_id"), trigger.get("type"), trigger.get("subtype"))
+        for action in list(devices.trigger_listeners.get(key, {}).values()):
+            await action(dict(trigger=dict(idx="0", **trigger)))
+
+
+async def main(args):
+    hass = FakeHass(asyncio.get_running_loop())
+    devices = install(hass)
+    component = make_component(hass, dict(queue=dict(enabled=args.queue, interval=args.interval)))
+    entry = FakeEntry("replay")
+    FakeStorage.links[entry.entry_id] = load_links(args.links)
+    await component.setup_config_entry(entry)
+    events = load_capture(args.capture)
+    print("Links: %s, events: %s" % (len(FakeStorage.links[entry.entry_id]), len(events)))
+
+    start = time.perf_counter()
+    origin = events[0][0] if len(events) else 0
+    for event in events:
+        if args.speed > 0:
+            delay = (event[0] - origin) / args.speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await fire(devices, event)
+    await hass.async_block_till_done()
+    elapsed = time.perf_counter() - start
+
+    dispatch = Histogram()
+    total = Histogram()
+    fires = errors = 0
+    for c in hass.data["quick_automation"]["entries"][entry.entry_id].values():
+        fires += c.stats.fires
+        errors += c.stats.errors
+        for src, dst in ((c.stats.dispatch, dispatch), (c.stats.total, total)):
+            dst.counts = [a + b for a, b in zip(dst.counts, src.counts)]
+            dst.count += src.count
+    print("Elapsed: %.3fs, events/s: %.1f" % (elapsed, len(events) / elapsed if elapsed else 0))
+    print("Link fires: %s, errors: %s, actions called: %s" % (fires, errors, len(hass.services.calls)))
+    print("Dispatch ms: %s" % (dispatch.as_dict()))
+    print("Total ms: %s" % (total.as_dict()))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capture", help="capture file written by quick_automation/record")
+    parser.add_argument("links", help="copy of .storage/quick_automation.<entry_id>")
+    parser.add_argument("--speed", type=float, default=1, help="replay speed multiplier, 0 for no delays")
+    parser.add_argument("--queue", action="store_true", help="enable the per-destination action queue")
+    parser.add_argument("--interval", type=float, default=0.25, help="action queue interval")
+    sys.exit(asyncio.run(main(parser.parse_args())))
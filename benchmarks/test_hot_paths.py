@@ -0,0 +1,99 @@
+"""Offline pytest-benchmark suite for classification, binding, serialization, subscription and reload.
+
+    pytest benchmarks/test_hot_paths.py --benchmark-save=baseline
+    pytest benchmarks/test_hot_paths.py --benchmark-compare --benchmark-compare-fail=min:20%
+"""
+import asyncio
+
+import pytest
+
+from fakes import FakeHass, FakeEntry, FakeStorage, install, make_component, populate, make_link
+
+from custom_components.quick_automation import _serialize_config
+
+SIZES = (10, 100, 1000)
+
+
+class Scenario:
+
+    def __init__(self, size: int) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.hass = FakeHass(self.loop)
+        self.devices = install(self.hass)
+        self.component = make_component(self.hass)
+        pairs = populate(self.devices, size)
+        self.sources = [x[0] for x in pairs]
+        self.destinations = [x[1] for x in pairs]
+        self.triggers = self.run(self._gather(self.component._load_triggers, self.sources))
+        self.actions = self.run(self._gather(self.component._load_actions, self.destinations))
+        self.configs = self.run(self._bind())
+        self.links = [make_link(x) for x in range(size)]
+
+    def run(self, target):
+        return self.loop.run_until_complete(target)
+
+    async def _gather(self, fn, items):
+        return [await fn(x) for x in items]
+
+    async def _bind(self):
+        return [await self.component.bind_trigger_actions(t, a) for t, a in zip(self.triggers, self.actions)]
+
+    def close(self):
+        self.run(self.hass.async_block_till_done())
+        self.loop.close()
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda x: "%s_links" % (x))
+def scenario(request):
+    result = Scenario(request.param)
+    yield result
+    result.close()
+
+
+def test_load_triggers(benchmark, scenario):
+    benchmark(lambda: scenario.run(scenario._gather(scenario.component._load_triggers, scenario.sources)))
+
+
+def test_load_triggers_cached(benchmark, scenario):
+    benchmark(lambda: scenario.run(scenario._gather(scenario.component.load_triggers, scenario.sources)))
+
+
+def test_load_actions(benchmark, scenario):
+    benchmark(lambda: scenario.run(scenario._gather(scenario.component._load_actions, scenario.destinations)))
+
+
+def test_bind_trigger_actions(benchmark, scenario):
+    benchmark(lambda: scenario.run(scenario._bind()))
+
+
+def test_serialize_config(benchmark, scenario):
+    benchmark(lambda: [_serialize_config(x) for x in scenario.configs])
+
+
+def test_subscribe(benchmark, scenario):
+    removers = []
+
+    async def _cb(key, idx, received=None):
+        pass
+
+    async def _subscribe():
+        for link in scenario.links:
+            removers.append(await scenario.component.subscribe(link["config"], _cb))
+
+    def _detach():
+        # Every round starts from an empty trigger multiplexer, so each trigger is initialized for real
+        while len(removers):
+            removers.pop()()
+        assert not scenario.component._trigger_mux.stats["triggers"]
+
+    benchmark.pedantic(lambda: scenario.run(_subscribe()), setup=_detach, rounds=20)
+    _detach()
+
+
+def test_reload(benchmark, scenario):
+    entry = FakeEntry("bench_%s" % (len(scenario.links)))
+    scenario.hass.config_entries.entries[entry.entry_id] = entry
+    FakeStorage.links[entry.entry_id] = scenario.links
+    scenario.run(scenario.component.setup_config_entry(entry))
+    benchmark(lambda: scenario.run(scenario.component.reload()))
+    scenario.run(scenario.component.unload_config_entry(entry))
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-from .constants import DOMAIN, PLATFORMS
+from .constants import (
+    DOMAIN, PLATFORMS, CONF_QUEUE, CONF_ENABLED, CONF_INTERVAL,
+    CONF_EXECUTOR, CONF_TIMEOUT, CONF_CONCURRENCY, CONF_MAX_PENDING, CONF_FAILURES, CONF_COOLDOWN,
+)
 from homeassistant.components.panel_custom import async_register_panel
 from homeassistant.components import websocket_api
-from .frontend import locate_dir
+from homeassistant.core import callback
+from .frontend import locate_dir, load_assets, PanelAssetView
 from .coordinator import Component
+from .links import item_key
 
 import voluptuous as vol
 
@@ -14,6 +19,22 @@ from copy import copy
 
 _LOGGER = logging.getLogger(__name__)
 
+CONFIG_SCHEMA = vol.Schema({
+    vol.Optional(DOMAIN, default={}): vol.Schema({
+        vol.Optional(CONF_QUEUE, default={}): vol.Schema({
+            vol.Optional(CONF_ENABLED, default=False): bool,
+            vol.Optional(CONF_INTERVAL, default=0.25): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        }),
+        vol.Optional(CONF_EXECUTOR, default={}): vol.Schema({
+            vol.Optional(CONF_TIMEOUT, default=10): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+            vol.Optional(CONF_CONCURRENCY, default=2): vol.All(int, vol.Range(min=1)),
+            vol.Optional(CONF_MAX_PENDING, default=8): vol.All(int, vol.Range(min=0)),
+            vol.Optional(CONF_FAILURES, default=5): vol.All(int, vol.Range(min=1)),
+            vol.Optional(CONF_COOLDOWN, default=30): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        }),
+    }),
+}, extra=vol.ALLOW_EXTRA)
+
 def get_component(hass) -> Component:
     return hass.data[DOMAIN]["component"]
 
@@ -24,21 +45,29 @@ async def async_setup_entry(hass, entry):
     return True
 
 async def async_unload_entry(hass, entry):
+    await get_component(hass).unload_config_entry(entry)
     hass.data[DOMAIN]["entries"].pop(entry.entry_id)
     return True
 
+async def async_remove_entry(hass, entry):
+    await get_component(hass).remove_config_entry(entry)
+
 async def async_setup(hass, config) -> bool:
-    hass.data[DOMAIN] = dict(entries={}, component=Component(hass))
+    hass.data[DOMAIN] = dict(entries={}, serialized={}, component=Component(hass, config.get(DOMAIN, {})))
+    hass.data[DOMAIN]["component"].start()
+    hass.data[DOMAIN]["component"].async_listen_changes(
+        lambda added, changed, removed: _forget_serialized(hass, changed + removed))
+    await hass.data[DOMAIN]["component"].async_load_rules()
     _LOGGER.debug(f"__init__::async_setup: {locate_dir}")
-    hass.http.register_static_path(
-        "/quick_automation_ui", "%s/dist" % (locate_dir()), cache_headers=False)
+    assets = await hass.async_add_executor_job(load_assets, "%s/dist" % (locate_dir()))
+    hass.http.register_view(PanelAssetView(assets))
     await async_register_panel(
         hass,
         "quick_automation",
         "quick-automation-panel",
         sidebar_title="Quick Automation",
         sidebar_icon="mdi:link-box-variant",
-        module_url="/quick_automation_ui/index.js",
+        module_url=assets.module_url,
         embed_iframe=False,
         require_admin=True
     )
@@ -47,12 +76,21 @@ async def async_setup(hass, config) -> bool:
     hass.components.websocket_api.async_register_command(ws_list_entries)
     hass.components.websocket_api.async_register_command(ws_remove_entry)
     hass.components.websocket_api.async_register_command(ws_toggle_enabled)
+    hass.components.websocket_api.async_register_command(ws_stats)
+    hass.components.websocket_api.async_register_command(ws_batch)
+    hass.components.websocket_api.async_register_command(ws_subscribe)
+    hass.components.websocket_api.async_register_command(ws_compatible)
+    hass.components.websocket_api.async_register_command(ws_record)
+    hass.components.websocket_api.async_register_command(ws_trace)
+    hass.components.websocket_api.async_register_command(ws_shards)
+    hass.components.websocket_api.async_register_command(ws_reload)
     return True
 
 _ITEM_SCHEMA = vol.Schema({
     vol.Optional("device_id"): str,
     vol.Optional("entity_id"): str,
 })
+_DESTINATION_SCHEMA = vol.Any(vol.All([_ITEM_SCHEMA], vol.Length(min=1)), _ITEM_SCHEMA)
 
 def _safe_yaml(value):
     if not value or len(value) == 0:
@@ -71,10 +109,34 @@ def _serialize_config(config):
     } for key, item in config.items()]
     return result
 
+def _serialize_entry(hass, item, shard_id: str):
+    cache = hass.data[DOMAIN]["serialized"]
+    if cached := cache.get(item["id"]):
+        if cached[0] is item:
+            return cached[1]
+    result = {
+        "entry_id": item["id"],
+        "shard": shard_id,
+        "revision": item.get("revision", 0),
+        "title": item["name"],
+        "enabled": item["enabled"],
+        "source": item["source"],
+        "destination": item["destination"],
+        "links": _serialize_config(item["config"]),
+    }
+    cache[item["id"]] = (item, result)
+    return result
+
+@callback
+def _forget_serialized(hass, ids):
+    cache = hass.data[DOMAIN]["serialized"]
+    for id in ids:
+        cache.pop(id, None)
+
 @websocket_api.websocket_command({
     vol.Required("type"): "quick_automation/load_trigger_action",
     vol.Required("source"): _ITEM_SCHEMA,
-    vol.Required("destination"): _ITEM_SCHEMA,
+    vol.Required("destination"): _DESTINATION_SCHEMA,
 })
 @websocket_api.async_response
 async def ws_load_trigger_action(hass, connection, msg: dict):
@@ -86,11 +148,12 @@ async def ws_load_trigger_action(hass, connection, msg: dict):
         "links": _serialize_config(config)
     })
 
-@websocket_api.websocket_command({
-    vol.Required("type"): "quick_automation/update_entry",
+_ENTRY_SCHEMA = {
     vol.Required("source"): _ITEM_SCHEMA,
-    vol.Required("destination"): _ITEM_SCHEMA,
+    vol.Required("destination"): _DESTINATION_SCHEMA,
     vol.Optional("entry_id"): str,
+    vol.Optional("revision"): int,
+    vol.Optional("shard"): str,
     vol.Required("enabled"): bool,
     vol.Required("title"): str,
     vol.Required("links"): [vol.Schema({
@@ -101,6 +164,50 @@ async def ws_load_trigger_action(hass, connection, msg: dict):
         vol.Required("triggers"): [str],
         vol.Optional("trigger"): vol.Any(str, None),
     })],
+}
+
+_OPERATION_SCHEMA = vol.Any(
+    vol.Schema({
+        **_ENTRY_SCHEMA,
+        vol.Required("op"): "create",
+    }),
+    vol.Schema({
+        **{k: v for k, v in _ENTRY_SCHEMA.items() if k != "entry_id"},
+        vol.Required("op"): "update",
+        vol.Required("entry_id"): str,
+    }),
+    vol.Schema({
+        vol.Required("op"): "toggle",
+        vol.Required("entry_id"): str,
+        vol.Optional("revision"): int,
+        vol.Required("enabled"): bool,
+    }),
+    vol.Schema({
+        vol.Required("op"): "delete",
+        vol.Required("entry_id"): str,
+        vol.Optional("revision"): int,
+    }),
+)
+
+@websocket_api.websocket_command({
+    vol.Required("type"): "quick_automation/compatible",
+    vol.Exclusive("source", "item"): _ITEM_SCHEMA,
+    vol.Exclusive("destination", "item"): _ITEM_SCHEMA,
+})
+@websocket_api.async_response
+async def ws_compatible(hass, connection, msg: dict):
+    component = get_component(hass)
+    if source := msg.get("source"):
+        result = await component.compatible_destinations(source)
+    elif destination := msg.get("destination"):
+        result = await component.compatible_sources(destination)
+    else:
+        result = []
+    connection.send_result(msg["id"], result)
+
+@websocket_api.websocket_command({
+    vol.Required("type"): "quick_automation/update_entry",
+    **_ENTRY_SCHEMA,
 })
 @websocket_api.async_response
 async def ws_update_entry(hass, connection, msg: dict):
@@ -109,44 +216,145 @@ async def ws_update_entry(hass, connection, msg: dict):
     await component.update_entry(msg)
     connection.send_result(msg["id"], {})
 
+@websocket_api.websocket_command({
+    vol.Required("type"): "quick_automation/batch",
+    vol.Required("operations"): [_OPERATION_SCHEMA],
+})
+@websocket_api.async_response
+async def ws_batch(hass, connection, msg: dict):
+    _LOGGER.debug("ws_batch: %s", len(msg["operations"]))
+    component = get_component(hass)
+    ids = await component.batch(msg["operations"])
+    connection.send_result(msg["id"], {"entry_ids": ids})
+
 @websocket_api.websocket_command({
     vol.Required("type"): "quick_automation/remove_entry",
     vol.Required("entry_id"): str,
+    vol.Optional("revision"): int,
 })
 @websocket_api.async_response
 async def ws_remove_entry(hass, connection, msg: dict):
     _LOGGER.debug("ws_remove_entry: %s", msg)
     component = get_component(hass)
-    await component.delete_entry(msg["entry_id"])
+    await component.delete_entry(msg["entry_id"], msg.get("revision"))
     connection.send_result(msg["id"], {})
 
 @websocket_api.websocket_command({
     vol.Required("type"): "quick_automation/toggle_enabled",
     vol.Required("entry_id"): str,
     vol.Required("enabled"): bool,
+    vol.Optional("revision"): int,
 })
 @websocket_api.async_response
 async def ws_toggle_enabled(hass, connection, msg: dict):
     _LOGGER.debug("ws_toggle_enabled: %s", msg)
     component = get_component(hass)
-    await component.toggle_enabled(msg["entry_id"], msg["enabled"])
+    await component.toggle_enabled(msg["entry_id"], msg["enabled"], msg.get("revision"))
     connection.send_result(msg["id"], {})
 
+def _serialize_shards(hass, shards, filter: dict = {}):
+    def _links(shard):
+        if source := filter.get("source"):
+            return shard.links.by_source(item_key(source))
+        if destination := filter.get("destination"):
+            return shard.links.by_destination(item_key(destination))
+        return shard.links.values()
+    return [_serialize_entry(hass, item, shard.id) for shard in shards for item in _links(shard)]
+
 @websocket_api.websocket_command({
     vol.Required("type"): "quick_automation/list",
+    vol.Optional("shard"): str,
+    vol.Exclusive("source", "item"): _ITEM_SCHEMA,
+    vol.Exclusive("destination", "item"): _ITEM_SCHEMA,
 })
 @websocket_api.async_response
 async def ws_list_entries(hass, connection, msg: dict):
     component = get_component(hass)
-    entries = component.entry_list()
-    # _LOGGER.debug("ws_list_entries: %s - %s", msg, entries)
-    result = [{
-        "entry_id": item["id"],
-        "title": item["name"],
-        "enabled": item["enabled"],
-        "source": item["source"],
-        "destination": item["destination"],
-        "links": _serialize_config(item["config"]),
-    } for item in entries]
-    connection.send_result(msg["id"], result)
+    shards = [component.shard(msg["shard"])] if msg.get("shard") else component.shards()
+    connection.send_result(msg["id"], _serialize_shards(hass, shards, msg))
+
+@websocket_api.websocket_command({
+    vol.Required("type"): "quick_automation/shards",
+})
+@websocket_api.async_response
+async def ws_shards(hass, connection, msg: dict):
+    component = get_component(hass)
+    connection.send_result(msg["id"], [dict(shard=shard.id, **shard.as_dict()) for shard in component.shards()])
+
+@websocket_api.websocket_command({
+    vol.Required("type"): "quick_automation/reload",
+    vol.Optional("shard"): str,
+})
+@websocket_api.async_response
+async def ws_reload(hass, connection, msg: dict):
+    _LOGGER.debug("ws_reload: %s", msg)
+    await get_component(hass).reload(msg.get("shard"))
+    connection.send_result(msg["id"], {})
+
+@websocket_api.websocket_command({
+    vol.Required("type"): "quick_automation/subscribe",
+})
+@websocket_api.async_response
+async def ws_subscribe(hass, connection, msg: dict):
+    component = get_component(hass)
+
+    def _serialize(ids):
+        return [_serialize_entry(hass, shard.links.get(id), shard.id) for id in ids if (shard := component.shard_for(id))]
 
+    @callback
+    def on_change(added, changed, removed):
+        connection.send_message(websocket_api.event_message(msg["id"], {
+            "added": _serialize(added),
+            "changed": _serialize(changed),
+            "removed": removed,
+        }))
+    connection.subscriptions[msg["id"]] = component.async_listen_changes(on_change)
+    connection.send_result(msg["id"])
+    connection.send_message(websocket_api.event_message(msg["id"], {
+        "added": _serialize_shards(hass, component.shards()),
+        "changed": [],
+        "removed": [],
+    }))
+
+
+@websocket_api.websocket_command({
+    vol.Required("type"): "quick_automation/stats",
+})
+@websocket_api.async_response
+async def ws_stats(hass, connection, msg: dict):
+    component = get_component(hass)
+    connection.send_result(msg["id"], component.stats())
+
+@websocket_api.websocket_command({
+    vol.Required("type"): "quick_automation/record",
+    vol.Required("enabled"): bool,
+    vol.Optional("path"): str,
+})
+@websocket_api.async_response
+async def ws_record(hass, connection, msg: dict):
+    component = get_component(hass)
+    if msg["enabled"]:
+        path = hass.config.path("quick_automation_capture.jsonl.gz")
+        if custom_path := msg.get("path"):
+            if not hass.config.is_allowed_path(custom_path):
+                connection.send_error(msg["id"], "invalid_path", "Path is not allowed: %s" % (custom_path))
+                return
+            path = custom_path
+        await component.start_recording(path)
+        connection.send_result(msg["id"], dict(path=path))
+    else:
+        connection.send_result(msg["id"], await component.stop_recording())
+
+@websocket_api.websocket_command({
+    vol.Required("type"): "quick_automation/trace",
+    vol.Optional("enabled"): bool,
+    vol.Optional("link_id"): str,
+    vol.Optional("device_id"): str,
+    vol.Optional("size"): vol.All(int, vol.Range(min=1, max=10000)),
+})
+@websocket_api.async_response
+async def ws_trace(hass, connection, msg: dict):
+    tracer = get_component(hass).tracer
+    if "enabled" in msg:
+        tracer.configure(msg["enabled"], msg.get("link_id"), msg.get("device_id"), msg.get("size"))
+    connection.send_result(msg["id"], tracer.as_dict())
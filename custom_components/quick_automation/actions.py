@@ -0,0 +1,44 @@
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+
+class ActionPlan:
+
+    __slots__ = ("hass", "destination", "platform", "domain", "service", "data", "index")
+
+    def __init__(self, hass, destination: str, data: dict, platform=None, domain: str = None, service: str = None) -> None:
+        self.hass = hass
+        self.destination = destination
+        self.platform = platform
+        self.domain = domain
+        self.service = service
+        self.data = data
+        self.index = None
+
+    async def __call__(self):
+        if self.platform:
+            await self.platform.async_call_action_from_config(self.hass, self.data, {}, None)
+        else:
+            await self.hass.services.async_call(self.domain, self.service, self.data, blocking=True)
+
+    def merge(self, other: "ActionPlan"):
+        if self.platform or other.platform:
+            return None
+        if (self.destination, self.domain, self.service) != (other.destination, other.domain, other.service):
+            return None
+        step = self.data.get("brightness_step_pct")
+        other_step = other.data.get("brightness_step_pct")
+        if step is None or other_step is None:
+            return None
+        data = {
+            **other.data,
+            "brightness_step_pct": max(-100, min(100, step + other_step)),
+        }
+        plan = ActionPlan(self.hass, self.destination, data, domain=self.domain, service=self.service)
+        plan.index = other.index
+        return plan
+
+    def __repr__(self) -> str:
+        if self.platform:
+            return "ActionPlan(%s, %s)" % (self.destination, self.data.get("type"))
+        return "ActionPlan(%s, %s.%s)" % (self.destination, self.domain, self.service)
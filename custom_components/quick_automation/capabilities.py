@@ -0,0 +1,237 @@
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry, device_registry
+
+import asyncio
+import copy
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+
+def _cache_key(kind: str, entry: dict):
+    if device_id := entry.get("device_id"):
+        return (kind, "device", device_id)
+    if entity_id := entry.get("entity_id"):
+        return (kind, "entity", entity_id)
+    return None
+
+
+class CapabilityCache:
+
+    def __init__(self, hass) -> None:
+        self.hass = hass
+        self._items = dict()
+        self._pending = dict()
+        self.hits = 0
+        self.misses = 0
+
+    async def async_get(self, kind: str, entry: dict, loader):
+        key = _cache_key(kind, entry)
+        if not key:
+            return await loader(entry)
+        if key in self._items:
+            self.hits += 1
+            return copy.deepcopy(self._items[key])
+        if pending := self._pending.get(key):
+            self.hits += 1
+            return copy.deepcopy(await asyncio.shield(pending))
+        self.misses += 1
+        task = self.hass.async_create_task(loader(entry))
+        self._pending[key] = task
+        try:
+            value = await task
+            if self._pending.get(key) is task:
+                self._items[key] = value
+        finally:
+            if self._pending.get(key) is task:
+                self._pending.pop(key)
+        _LOGGER.debug("Capability cache miss: %s, hits: %s, misses: %s", key, self.hits, self.misses)
+        return copy.deepcopy(value)
+
+    def _invalidate(self, type: str, id: str):
+        for kind in ("trigger", "action"):
+            self._items.pop((kind, type, id), None)
+            self._pending.pop((kind, type, id), None)
+
+    def invalidate_device(self, device_id: str):
+        self._invalidate("device", device_id)
+
+    def invalidate_entity(self, entity_id: str):
+        self._invalidate("entity", entity_id)
+
+    def invalidate_devices(self):
+        for key in [x for x in self._items if x[1] == "device"]:
+            self._items.pop(key)
+        for key in [x for x in self._pending if x[1] == "device"]:
+            self._pending.pop(key)
+
+    def clear(self):
+        self._items.clear()
+        self._pending.clear()
+
+    @property
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, size=len(self._items))
+
+    @callback
+    def _on_device_updated(self, event):
+        if device_id := event.data.get("device_id"):
+            self.invalidate_device(device_id)
+
+    @callback
+    def _on_entity_updated(self, event):
+        for key in ("entity_id", "old_entity_id"):
+            if entity_id := event.data.get(key):
+                self.invalidate_entity(entity_id)
+        entity = entity_registry.async_get(self.hass).async_get(event.data.get("entity_id", ""))
+        if entity and entity.device_id:
+            self.invalidate_device(entity.device_id)
+        elif event.data.get("action") == "remove":
+            self.invalidate_devices()
+
+    @callback
+    def async_listen(self):
+        remove_device = self.hass.bus.async_listen(device_registry.EVENT_DEVICE_REGISTRY_UPDATED, self._on_device_updated)
+        remove_entity = self.hass.bus.async_listen(entity_registry.EVENT_ENTITY_REGISTRY_UPDATED, self._on_entity_updated)
+        def _remove_listeners():
+            remove_device()
+            remove_entity()
+        return _remove_listeners
+
+
+_LINK_TYPES = ("on_off", "brightness", "left_right", "toggle")
+_BUILD_CONCURRENCY = 8
+
+
+def link_types(triggers, actions):
+    result = [x for x in ("brightness", "left_right", "on_off") if x in triggers and x in actions]
+    if "toggle" in triggers:
+        if "toggle" in actions or ("on_off" in actions and "on_off" not in result):
+            result.append("toggle")
+    return sorted(result, key=_LINK_TYPES.index)
+
+
+def _item(key):
+    return {"%s_id" % (key[0]): key[1]}
+
+
+class CapabilityIndex:
+
+    def __init__(self, hass, load_triggers, load_actions) -> None:
+        self.hass = hass
+        self._load_triggers = load_triggers
+        self._load_actions = load_actions
+        self._sources = dict()
+        self._destinations = dict()
+        self._by_trigger = {x: set() for x in _LINK_TYPES}
+        self._by_action = {x: set() for x in _LINK_TYPES}
+        self._build = None
+
+    def _set(self, items: dict, index: dict, key, types):
+        for type in items.pop(key, ()):
+            index[type].discard(key)
+        if len(types):
+            items[key] = frozenset(types)
+            for type in types:
+                index[type].add(key)
+
+    async def _update(self, key):
+        item = _item(key)
+        try:
+            triggers = await self._load_triggers(item)
+            actions = await self._load_actions(item)
+        except Exception:
+            _LOGGER.debug("Failed to load capabilities: %s", key, exc_info=True)
+            triggers, actions = {}, {}
+        self._set(self._sources, self._by_trigger, key, [x for x in triggers if x in self._by_trigger])
+        self._set(self._destinations, self._by_action, key, [x for x in actions if x in self._by_action])
+
+    @callback
+    def _remove(self, key):
+        self._set(self._sources, self._by_trigger, key, ())
+        self._set(self._destinations, self._by_action, key, ())
+
+    async def _async_build(self):
+        keys = [("device", x) for x in device_registry.async_get(self.hass).devices]
+        keys += [("entity", x) for x in entity_registry.async_get(self.hass).entities]
+        semaphore = asyncio.Semaphore(_BUILD_CONCURRENCY)
+        async def _update(key):
+            async with semaphore:
+                await self._update(key)
+        await asyncio.gather(*[_update(key) for key in keys])
+        _LOGGER.debug("Capability index built: %s sources, %s destinations", len(self._sources), len(self._destinations))
+
+    async def async_ensure(self):
+        if not self._build:
+            self._build = self.hass.async_create_task(self._async_build())
+        await asyncio.shield(self._build)
+
+    @callback
+    def _on_device_updated(self, event):
+        if not self._build or not (device_id := event.data.get("device_id")):
+            return
+        if event.data.get("action") == "remove":
+            self._remove(("device", device_id))
+        else:
+            self.hass.async_create_task(self._update(("device", device_id)))
+
+    @callback
+    def _on_entity_updated(self, event):
+        if not self._build or not (entity_id := event.data.get("entity_id")):
+            return
+        if old_entity_id := event.data.get("old_entity_id"):
+            self._remove(("entity", old_entity_id))
+        if event.data.get("action") == "remove":
+            self._remove(("entity", entity_id))
+        else:
+            self.hass.async_create_task(self._update(("entity", entity_id)))
+        entity = entity_registry.async_get(self.hass).async_get(entity_id)
+        if entity and entity.device_id:
+            self.hass.async_create_task(self._update(("device", entity.device_id)))
+
+    @callback
+    def async_listen(self):
+        remove_device = self.hass.bus.async_listen(device_registry.EVENT_DEVICE_REGISTRY_UPDATED, self._on_device_updated)
+        remove_entity = self.hass.bus.async_listen(entity_registry.EVENT_ENTITY_REGISTRY_UPDATED, self._on_entity_updated)
+        def _remove_listeners():
+            remove_device()
+            remove_entity()
+        return _remove_listeners
+
+    def _ranked(self, candidates, types_for):
+        result = []
+        for key in candidates:
+            if types := types_for(key):
+                result.append(dict(**_item(key), types=types))
+        return sorted(result, key=lambda x: (_LINK_TYPES.index(x["types"][0]), -len(x["types"])))
+
+    async def destinations_for(self, item: dict):
+        await self.async_ensure()
+        if not (key := _cache_key("source", item)):
+            return []
+        key = key[1:]
+        triggers = self._sources.get(key, frozenset())
+        candidates = set()
+        for type in triggers:
+            candidates |= self._by_action[type]
+        if "toggle" in triggers:
+            candidates |= self._by_action["on_off"]
+        candidates.discard(key)
+        return self._ranked(candidates, lambda x: link_types(triggers, self._destinations.get(x, ())))
+
+    async def sources_for(self, item: dict):
+        await self.async_ensure()
+        if not (key := _cache_key("destination", item)):
+            return []
+        key = key[1:]
+        actions = self._destinations.get(key, frozenset())
+        candidates = set()
+        for type in actions:
+            candidates |= self._by_trigger[type]
+        if "on_off" in actions:
+            candidates |= self._by_trigger["toggle"]
+        candidates.discard(key)
+        return self._ranked(candidates, lambda x: link_types(self._sources.get(x, ()), actions))
+
+    @property
+    def stats(self):
+        return dict(sources=len(self._sources), destinations=len(self._destinations), ready=bool(self._build and self._build.done()))
@@ -1,17 +1,32 @@
 from homeassistant import config_entries
+from homeassistant.const import CONF_NAME
 from .constants import DOMAIN
 
+import voluptuous as vol
+
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 
 class ConfigFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
-    async def async_step_user(self, user_input):
-        # if get_config_entry(self.hass, None):
-        #     return self.async_abort(reason="already_registered")
-        return self.async_create_entry(
-            title="Quick Automation",
-            options={},
-            data={},
+    async def async_step_user(self, user_input=None):
+        errors = dict()
+        if user_input is not None:
+            name = user_input[CONF_NAME].strip()
+            if any(x.title == name for x in self._async_current_entries()):
+                errors["base"] = "already_configured"
+            else:
+                return self.async_create_entry(
+                    title=name,
+                    options={},
+                    data={},
+                )
+        default = "Quick Automation" if not len(self._async_current_entries()) else ""
+        return self.async_show_form(
+            step_id="user",
+            data_schema=vol.Schema({
+                vol.Required(CONF_NAME, default=default): vol.All(str, vol.Length(min=1)),
+            }),
+            errors=errors,
         )
@@ -1,2 +1,12 @@
 DOMAIN = "quick_automation"
 PLATFORMS = ["quick_automation"]
+
+CONF_QUEUE = "queue"
+CONF_ENABLED = "enabled"
+CONF_INTERVAL = "interval"
+CONF_EXECUTOR = "executor"
+CONF_TIMEOUT = "timeout"
+CONF_CONCURRENCY = "concurrency"
+CONF_MAX_PENDING = "max_pending"
+CONF_FAILURES = "failures"
+CONF_COOLDOWN = "cooldown"
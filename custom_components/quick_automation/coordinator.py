@@ -1,94 +1,141 @@
 from cgitb import enable
 from multiprocessing import context
-from .constants import DOMAIN
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, CoordinatorEntity
+from .constants import (
+    DOMAIN, CONF_QUEUE, CONF_ENABLED, CONF_INTERVAL,
+    CONF_EXECUTOR, CONF_TIMEOUT, CONF_CONCURRENCY, CONF_MAX_PENDING, CONF_FAILURES, CONF_COOLDOWN,
+)
+from .capabilities import CapabilityCache, CapabilityIndex
+from .router import StateRouter, TriggerMultiplexer, TrafficRecorder
+from .links import LinkStore, LinkStorage, item_key, item_list
+from .rules import RuleSet, load_rules, RULES_FILE
+from .actions import ActionPlan
+from .dispatch import ActionQueue, DestinationExecutor
+from .stats import LinkStats
+from .trace import LinkTracer
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.entity_component import EntityComponent
 from homeassistant.helpers import entity_registry, device_registry
 from homeassistant.components import device_automation, light
 from homeassistant.const import (EVENT_HOMEASSISTANT_STARTED)
-from homeassistant.helpers.trigger import async_initialize_triggers
-from homeassistant.helpers.event import async_track_state_change
 from homeassistant.util.yaml import parse_yaml
 
+import asyncio
 import secrets
+import time
 
 from datetime import timedelta
 import copy
 import logging
 _LOGGER = logging.getLogger(__name__)
 
-_ON_OFF_ACTIONS = [
-    (dict(domain="mqtt", type="action", subtype="on"), dict(domain="mqtt", type="action", subtype="off")),
-    (dict(domain="mqtt", type="action", subtype="open"), dict(domain="mqtt", type="action", subtype="close")),
-    (dict(domain="zha", type="remote_button_short_press", subtype="open"), dict(domain="zha", type="remote_button_short_press", subtype="close")),
-    (dict(domain="zha", type="remote_button_short_press", subtype="turn_on"), dict(domain="zha", type="remote_button_short_press", subtype="turn_off")),
-]
-_BRIGHTNESS_ACTIONS = [
-    (dict(domain="mqtt", type="action", subtype="brightness_move_up"), dict(domain="mqtt", type="action", subtype="brightness_move_down")),
-    (dict(domain="zha", type="remote_button_long_press", subtype="dim_up"), dict(domain="zha", type="remote_button_long_press", subtype="dim_down")),
-    (dict(domain="zha", type="remote_button_long_press", subtype="open"), dict(domain="zha", type="remote_button_long_press", subtype="close")),
-]
-_LEFT_RIGHT_ACTIONS = [
-    (dict(domain="mqtt", type="action", subtype="arrow_left_click"), dict(domain="mqtt", type="action", subtype="arrow_right_click")),
-    (dict(domain="zha", type="remote_button_short_press", subtype="left"), dict(domain="zha", type="remote_button_short_press", subtype="right")),
-]
-_TOGGLE_ACTIONS = [
-    (dict(domain="mqtt", type="action", subtype="toggle"), dict(domain="mqtt", type="action")),
-    (dict(domain="mqtt", type="action", subtype="single"), dict(domain="mqtt", type="action")),
-    (dict(domain="zha", type="remote_button_short_press", subtype="remote_button_short_press"), dict(domain="zha", type="remote_button_short_press")),
-    (dict(domain="zha", type="remote_button_short_press", subtype="turn_on"), dict(domain="zha", type="remote_button_short_press")),
-]
-_ON_OFF_TRIGGERS = [("turned_on", "turned_off")]
-
-_BINARY_SENSOR_TRIGGERS = ["co", "cold", "connected", "gas", "hot", "light", "locked", "moist", "motion", "moving", "occupied", "plugged_in", "present", "problem", "running", "unsafe", "smoke", "sound", "tampered", "vibration", "opened"]
+_STARTUP_CONCURRENCY = 16
+_STATS_WRITE_INTERVAL = 5
+
 _ON_OFF_ENTITY_DOMAINS = ["binary_sensor", "fan", "light", "switch", "remote", "siren", "vacuum", "humidifier", "alert", "media_player"]
 _TOGGLE_ENTITY_DOMAINS = ["script", "automation", "button", "scene"]
 _ON_OFF_ENTITY_ACTION_DOMAINS = ["fan", "light", "switch", "remote", "siren", "vacuum", "humidifier", "cover", "lock", "alert", "media_player"]
 _TOGGLE_ENTITY_ACTION_DOMAINS = ["script", "automation", "button", "scene"]
 
+class ConflictError(HomeAssistantError):
+    pass
+
 class Component(EntityComponent):
 
-    def __init__(self, hass) -> None:
+    def __init__(self, hass, config: dict = {}) -> None:
         super().__init__(
             _LOGGER, DOMAIN, hass
         )
+        queue = config.get(CONF_QUEUE, {})
+        self._queue = ActionQueue(hass, queue.get(CONF_INTERVAL, 0), self._execute) if queue.get(CONF_ENABLED) else None
+        self._executor_config = config.get(CONF_EXECUTOR, {})
+        self._executors = dict()
+        self._shards = dict()
+        self._change_listeners = dict()
+        self.tracer = LinkTracer()
+        self._startup = dict()
+        self._remove_startup_listener = None
+        self._capabilities = CapabilityCache(hass)
+        self._capability_index = CapabilityIndex(hass, self._load_triggers, self._load_actions)
+        self._rules = RuleSet()
+        self._router = StateRouter(hass)
+        self._trigger_mux = TriggerMultiplexer(hass)
+        self._action_platforms = dict()
+
+    def start(self):
+        self._capabilities.async_listen()
+        self._capability_index.async_listen()
+
+    async def compatible_destinations(self, source: dict):
+        return await self._capability_index.destinations_for(source)
+
+    async def compatible_sources(self, destination: dict):
+        return await self._capability_index.sources_for(destination)
+
+    async def async_load_rules(self):
+        self._rules = await self.hass.async_add_executor_job(load_rules, self.hass.config.path(RULES_FILE))
+        self._capabilities.clear()
+
+    @property
+    def capability_stats(self):
+        return self._capabilities.stats
+
+    def stats(self):
+        return dict(
+            links={id: c.stats.as_dict() for shard in self._shards.values() for id, c in shard.coordinators.items()},
+            shards={id: shard.as_dict() for id, shard in self._shards.items()},
+            capabilities=self._capabilities.stats,
+            capability_index=self._capability_index.stats,
+            states=self._router.stats,
+            triggers=self._trigger_mux.stats,
+            queue=self._queue.stats if self._queue else None,
+            destinations={id: e.stats for id, e in self._executors.items()},
+        )
 
     async def setup_config_entry(self, entry):
-        self._config_entry = entry
-        self.hass.data[DOMAIN]["entries"][entry.entry_id] = dict()
-        entities = []
-        _LOGGER.debug("setup_config_entry: %s", len(self.entry_list()))
-        for item in self.entry_list():
-            c = set_coordinator(self.hass, self, entry, item)
-            await c.async_config_entry_first_refresh()
-            entities.append(BaseEntity(c))
-        await self.async_add_entities(entities)
+        shard = LinkShard(self, entry)
+        self._shards[entry.entry_id] = shard
+        try:
+            await shard.async_setup()
+        except Exception:
+            self._shards.pop(entry.entry_id, None)
+            raise
+
+    def shards(self):
+        return list(self._shards.values())
+
+    def shard(self, shard_id: str = None):
+        if shard_id:
+            if shard := self._shards.get(shard_id):
+                return shard
+            raise HomeAssistantError("Shard not found: %s" % (shard_id))
+        for entry in self.hass.config_entries.async_entries(DOMAIN):
+            if shard := self._shards.get(entry.entry_id):
+                return shard
+        raise HomeAssistantError("No link shards loaded")
+
+    def shard_for(self, id: str):
+        for shard in self._shards.values():
+            if id in shard.links:
+                return shard
+        return None
 
-    def _entry_list(self):
-        return self._config_entry.as_dict().get("data", {}).get("entries", [])
+    def links(self):
+        return [link for shard in self._shards.values() for link in shard.links.values()]
 
-    def entry_list(self):
-        return list(self._entry_list())
+    def link(self, id: str):
+        if shard := self.shard_for(id):
+            return shard.links.get(id)
+        return None
 
-    async def update_entry(self, data):
+    async def _build_entry(self, id: str, data: dict):
         def _find_trigger(triggers, trigger):
             for t in triggers["select"]:
                 if t[triggers["key"]] == trigger:
                     return t
             return None
-        entry_list = self.entry_list()
-        entry = None
-        if id := data.get("entry_id"):
-            for idx, item in enumerate(entry_list):
-                if item["id"] == id:
-                    entry = dict(id=id)
-                    entry_list[idx] = entry
-                    break
-        else:
-            entry = dict(id=secrets.token_hex(8))
-            entry_list.append(entry)
-        if not entry:
-            return False
+        entry = dict(id=id)
         entry["config"] = await self.build_config(data)
         entry["name"] = data["title"]
         entry["source"] = data["source"]
@@ -102,93 +149,97 @@ class Component(EntityComponent):
                 if selected := link.get("trigger"):
                     if trigger := _find_trigger(config_item["trigger"], selected):
                         config_item["trigger"]["triggers"] = [trigger]
-        await self.reload(dict(entries=entry_list))
+        return entry
+
+    def _operation_shard(self, operation: dict):
+        if operation["op"] == "create":
+            return self.shard(operation.get("shard"))
+        if not (shard := self.shard_for(operation.get("entry_id"))):
+            raise HomeAssistantError("Link not found: %s" % (operation.get("entry_id")))
+        if operation.get("shard") and operation["shard"] != shard.id:
+            raise HomeAssistantError("Link %s belongs to shard %s" % (operation["entry_id"], shard.id))
+        return shard
+
+    async def batch(self, operations: list):
+        groups = dict()
+        for idx, operation in enumerate(operations):
+            groups.setdefault(self._operation_shard(operation), []).append((idx, operation))
+        results = await asyncio.gather(*[shard.batch([x[1] for x in items]) for shard, items in groups.items()], return_exceptions=True)
+        ids = [None] * len(operations)
+        for items, result in zip(groups.values(), results):
+            if isinstance(result, Exception):
+                raise result
+            for (idx, _), id in zip(items, result):
+                ids[idx] = id
+        return ids
+
+    async def update_entry(self, data):
+        if id := data.get("entry_id"):
+            if not self.shard_for(id):
+                return False
+        await self.batch([{**data, "op": "update" if id else "create"}])
         return True
 
     def entity_id_by_id(self, id: str):
-        for entity in list(self.entities):
-            if entity.entry_id == id:
-                return entity.entity_id
+        for shard in self._shards.values():
+            if entity_id := shard.entity_id_by_id(id):
+                return entity_id
         return None
 
-    async def delete_entry(self, entry_id: str):
-        entity_reg = await entity_registry.async_get_registry(self.hass)
-        entry_list = self.entry_list()
-        for idx, item in enumerate(entry_list):
-            if item["id"] == entry_id:
-                del entry_list[idx]
-                entity_reg.async_remove(self.entity_id_by_id(entry_id))
-                await self.reload(dict(entries=entry_list))
-                return True
-        return False
-
-    async def toggle_enabled(self, entry_id: str, enabled: bool):
-        entry_list = self.entry_list()
-        for idx, item in enumerate(entry_list):
-            if item["id"] == entry_id:
-                entry_list[idx] = {
-                    **item,
-                    "enabled": enabled,
-                }
-                await self.reload(dict(entries=entry_list))
-                return True
-        return False
+    async def delete_entry(self, entry_id: str, revision: int = None):
+        if not self.shard_for(entry_id):
+            return False
+        await self.batch([dict(op="delete", entry_id=entry_id, revision=revision)])
+        return True
 
-    async def reload(self, data):
-        self.hass.config_entries.async_update_entry(self._config_entry, data=data)
-        for entity in list(self.entities):
-            await entity.async_remove()
-        await self.hass.config_entries.async_reload(self._config_entry.entry_id)
+    async def toggle_enabled(self, entry_id: str, enabled: bool, revision: int = None):
+        if not self.shard_for(entry_id):
+            return False
+        await self.batch([dict(op="toggle", entry_id=entry_id, enabled=enabled, revision=revision)])
+        return True
 
-    def _device_triggers(self, triggers, domain=None, type=None, subtype=None):
-        def l(t):
-            if domain and t.get("domain") != domain:
-                return False
-            if type and t.get("type") != type:
-                return False
-            if subtype and t.get("subtype") != subtype:
-                return False
-            return True
-        return list(filter(l, triggers))
+    @callback
+    def async_listen_changes(self, cb):
+        token = object()
+        self._change_listeners[token] = cb
 
-    def _device_trigger(self, triggers, **kwargs):
-        t_list = self._device_triggers(triggers, **kwargs)
-        return t_list[0] if len(t_list) else None
+        @callback
+        def _remove_listener():
+            self._change_listeners.pop(token, None)
+        return _remove_listener
 
-    def _map_binary_sensor(self, triggers):
-        t_list = self._device_triggers(triggers, domain="binary_sensor")
-        type_map = {x["type"]: x for x in t_list}
-        result = {}
-        for key, value in type_map.items():
-            if f"not_{key}" in type_map:
-                result[key] = dict(triggers=[value, type_map[f"not_{key}"]])
-            if f"no_{key}" in type_map:
-                result[key] = dict(triggers=[value, type_map[f"no_{key}"]])
-        return result
+    @callback
+    def _notify_changes(self, added: list, changed: list, removed: list):
+        if not len(added) and not len(changed) and not len(removed):
+            return
+        for cb in list(self._change_listeners.values()):
+            cb(added, changed, removed)
 
+    async def unload_config_entry(self, entry):
+        if shard := self._shards.pop(entry.entry_id, None):
+            await shard.async_unload()
+
+    async def remove_config_entry(self, entry):
+        await LinkStorage(self.hass, entry.entry_id).async_remove()
+
+    async def reload(self, shard_id: str = None):
+        for shard in [self.shard(shard_id)] if shard_id else self.shards():
+            await self.hass.config_entries.async_reload(shard.id)
 
     async def load_actions(self, entry):
+        return await self._capabilities.async_get("action", entry, self._load_actions)
+
+    async def load_triggers(self, entry):
+        return await self._capabilities.async_get("trigger", entry, self._load_triggers)
+
+    async def _load_actions(self, entry):
         entity_reg = await entity_registry.async_get_registry(self.hass)
         result = dict()
         if device_id := entry.get("device_id"):
             actions = await device_automation.async_get_device_automations(self.hass, device_automation.DeviceAutomationType.ACTION, [device_id])
-            a_list = actions.get(device_id)
-            def _add_pair(name, kwargs1, kwargs2):
-                t1 = self._device_trigger(a_list, **kwargs1)
-                t2 = self._device_trigger(a_list, **kwargs2)
-                if t1 and t2:
-                    result[name] = dict(actions=[t1, t2])
+            a_list = actions.get(device_id, [])
             _LOGGER.debug("Actions: [%s] = %s", device_id, a_list)
-            if toggle := self._device_trigger(a_list, type="toggle"):
-                result["toggle"] = dict(actions=[toggle])
-            elif press := self._device_trigger(a_list, type="press"):
-                result["toggle"] = dict(actions=[press])
-            _add_pair("on_off", {"type": "turn_on"}, {"type": "turn_off"})
-            _add_pair("on_off", {"type": "open"}, {"type": "close"})
-            if action := self._device_trigger(a_list, type="set_position", domain="cover"):
-                if "on_off" not in result:
-                    result["on_off"] = dict(actions=[{**action, "position": 100}, {**action, "position": 0}])
-            _add_pair("brightness", {"type": "brightness_increase"}, {"type": "brightness_decrease"})
+            result = self._rules.resolve_actions(a_list)
         elif entity_id := entry.get("entity_id"):
             [domain, name] = entity_id.split(".")
             if domain in _ON_OFF_ENTITY_ACTION_DOMAINS:
@@ -221,7 +272,7 @@ class Component(EntityComponent):
         # _LOGGER.debug("Actions capabilities: %s = %s", entry, result)
         return result
 
-    async def load_triggers(self, entry):
+    async def _load_triggers(self, entry):
         entity_reg = await entity_registry.async_get_registry(self.hass)
         # device_reg = device_registry.async_get(self.hass)
         result = dict()
@@ -229,39 +280,14 @@ class Component(EntityComponent):
             triggers = await device_automation.async_get_device_automations(self.hass, device_automation.DeviceAutomationType.TRIGGER, [device_id])
             t_list = triggers.get(device_id, [])
 
-            def _add_pair(name, kwargs1, kwargs2):
-                t1 = self._device_trigger(t_list, **kwargs1)
-                t2 = self._device_trigger(t_list, **kwargs2)
-                if t1 and t2:
-                    result[name] = dict(triggers=[t1, t2])
-
             _LOGGER.debug("Triggers: [%s] = %s", device_id, t_list)
-            for pair in _ON_OFF_TRIGGERS:
-                _add_pair("on_off", {"type": pair[0]}, {"type": pair[1]})
-            for pair in _ON_OFF_ACTIONS:
-                _add_pair("on_off", pair[0], pair[1])
-            for pair in _BRIGHTNESS_ACTIONS:
-                _add_pair("brightness", pair[0], pair[1])
-            for pair in _LEFT_RIGHT_ACTIONS:
-                _add_pair("left_right", pair[0], pair[1])
-            binary_map = self._map_binary_sensor(t_list)
-            if "on_off" not in result:
-                for item in _BINARY_SENSOR_TRIGGERS:
-                    if pair := binary_map.get(item):
-                        result["on_off"] = pair
-                        break
-            for pair in _TOGGLE_ACTIONS:
-                actions = self._device_triggers(t_list, **pair[1])
-                if t := self._device_trigger(t_list, **pair[0]):
-                    result["toggle"] = dict(triggers=[t], select=actions, key="subtype")
-                if "toggle" not in result and len(actions):
-                    result["toggle"] = dict(triggers=[actions[0]], select=actions, key="subtype")
+            result = self._rules.resolve_triggers(t_list)
         elif entity_id := entry.get("entity_id"):
             [domain, name] = entity_id.split(".")
             if domain in _ON_OFF_ENTITY_DOMAINS:
                 result["on_off"] = dict(triggers=[{"entity_id": entity_id, "state": "on"}, {"entity_id": entity_id, "state": "off"}])
             if domain in _TOGGLE_ENTITY_DOMAINS:
-                result["toggle"] = dict(trigers=[{"entity_id": entity_id, "domain": domain}])
+                result["toggle"] = dict(triggers=[{"entity_id": entity_id, "domain": domain}])
             # state = self.hass.states.get(entity_id)
             _LOGGER.debug("Entity trigger: %s = %s", entity_id, result)
         # _LOGGER.debug("Trigger capabilities: %s = %s", entry, result)
@@ -285,146 +311,484 @@ class Component(EntityComponent):
         device_reg = device_registry.async_get(self.hass)
         if device_id := data.get("device_id"):
             device = device_reg.async_get(device_id)
-            return device.name_by_user or device.name if device else device_id
+            return (device.name_by_user or device.name or device_id) if device else device_id
         if entity_id := data.get("entity_id"):
             entity = entity_reg.async_get(entity_id)
-            return entity.name or entity.original_name if entity else entity_id
+            return (entity.name or entity.original_name or entity_id) if entity else entity_id
         return "undefined"
 
     async def build_name(self, data: dict):
         source_name = await self._entity_name(data.get("source", {}))
-        destination_name = await self._entity_name(data.get("destination", {}))
-        return "%s - %s" % (source_name, destination_name)
+        destination_names = [await self._entity_name(x) for x in item_list(data.get("destination"))]
+        return "%s - %s" % (source_name, ", ".join(destination_names) or "undefined")
 
     async def build_config(self, data: dict):
         triggers = await self.load_triggers(data.get("source", {}))
-        actions = await self.load_actions(data.get("destination", {}))
-        binding = await self.bind_trigger_actions(triggers, actions)
-        _LOGGER.debug("Binding - triggers: %s, %s", data, triggers)
-        _LOGGER.debug("Binding - actions: %s, %s", data, actions)
-        _LOGGER.debug("Binding - result: %s, %s", data, binding)
-        return binding
+        destinations = item_list(data.get("destination"))
+        if len(destinations) < 2:
+            actions = await self.load_actions(destinations[0] if len(destinations) else {})
+            binding = await self.bind_trigger_actions(triggers, actions)
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Binding: %s -> %s, triggers: %s, actions: %s, result: %s", item_key(data.get("source")), item_key(destinations[0] if len(destinations) else None), list(triggers), list(actions), list(binding))
+            return binding
+        bindings = [await self.bind_trigger_actions(triggers, await self.load_actions(x)) for x in destinations]
+        result = dict()
+        for key, item in bindings[0].items():
+            if all(key in x for x in bindings[1:]):
+                result[key] = {
+                    **item,
+                    "enabled": all(x[key]["enabled"] for x in bindings),
+                    "destinations": [x[key]["action"] for x in bindings],
+                }
+        _LOGGER.debug("Binding: %s -> %s destinations, result: %s", item_key(data.get("source")), len(destinations), list(result))
+        return result
 
-    async def call_action(self, action, extra, type=None):
-        if "device_id" in action:
+    async def _action_platform(self, domain: str):
+        if not (platform := self._action_platforms.get(domain)):
             platform = await device_automation.async_get_device_automation_platform(
-                self.hass, 
-                action["domain"], 
+                self.hass,
+                domain,
                 device_automation.DeviceAutomationType.ACTION,
             )
+            self._action_platforms[domain] = platform
+        return platform
+
+    async def compile_action(self, action, extra, type=None) -> ActionPlan:
+        if "device_id" in action:
             data = {
                 **action,
                 **extra,
                 "type": type if type else action["type"],
             }
-            _LOGGER.debug("call_action::device: %s, %s", data, action)
-            await platform.async_call_action_from_config(self.hass, data, dict(), None)
-        else:
-            # Entity type - call service
-            [domain, name] = action["entity_id"].split(".")
-            service = type or action.get("action")
-            data = {
-                **action.get("extra", {}),
-                **extra,
-                "entity_id": action["entity_id"],
-            }
-            _LOGGER.debug("call_action::entity: %s.%s, %s", domain, service, data)
-            await self.hass.services.async_call(domain, service, data, blocking=True)
+            platform = await self._action_platform(action["domain"])
+            return ActionPlan(self.hass, action["device_id"], data, platform=platform)
+        # Entity type - call service
+        [domain, name] = action["entity_id"].split(".")
+        service = type or action.get("action")
+        data = {
+            **action.get("extra", {}),
+            **extra,
+            "entity_id": action["entity_id"],
+        }
+        return ActionPlan(self.hass, action["entity_id"], data, domain=domain, service=service)
+
+    async def compile_actions(self, config: dict):
+        plans = dict()
+        for key, entry in config.items():
+            for destination in entry.get("destinations") or [entry["action"]]:
+                actions = destination["actions"]
+                for idx in range(len(entry["trigger"]["triggers"])):
+                    action_type = None
+                    action_idx = idx
+                    if len(actions) > 1:
+                        if entry["reverse"]:
+                            action_idx = 0 if idx == 1 else 1
+                        if key == "toggle":
+                            action_type = "toggle"
+                    if action_idx >= len(actions):
+                        continue
+                    try:
+                        plan = await self.compile_action(actions[action_idx], entry["extra"], action_type)
+                        plan.index = action_idx
+                        plans[(key, idx)] = plans.get((key, idx), ()) + (plan, )
+                    except Exception:
+                        _LOGGER.exception("Failed to prepare action: %s, %s", key, actions[action_idx])
+        return plans
+
+    @callback
+    def schedule_activate(self, coordinator):
+        if not self._remove_startup_listener:
+            self._remove_startup_listener = self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, self._async_startup)
+        token = object()
+        self._startup[token] = (coordinator, coordinator.generation)
+
+        @callback
+        def _cancel():
+            self._startup.pop(token, None)
+        return _cancel
+
+    async def _async_startup(self, _):
+        self._remove_startup_listener = None
+        pending = list(self._startup.values())
+        self._startup.clear()
+        start = time.monotonic()
+        semaphore = asyncio.Semaphore(_STARTUP_CONCURRENCY)
+        async def _activate(coordinator, generation):
+            async with semaphore:
+                try:
+                    await coordinator.async_activate(generation=generation)
+                except Exception:
+                    _LOGGER.exception("Failed to activate link: %s", coordinator.entity_id)
+        await asyncio.gather(*[_activate(c, g) for c, g in pending])
+        _LOGGER.info("Activated %s links in %.3fs", len(pending), time.monotonic() - start)
+
+    def _executor(self, destination: str) -> DestinationExecutor:
+        if not (executor := self._executors.get(destination)):
+            config = self._executor_config
+            executor = DestinationExecutor(
+                destination,
+                timeout=config.get(CONF_TIMEOUT, 10),
+                concurrency=config.get(CONF_CONCURRENCY, 2),
+                max_pending=config.get(CONF_MAX_PENDING, 8),
+                failures=config.get(CONF_FAILURES, 5),
+                cooldown=config.get(CONF_COOLDOWN, 30),
+            )
+            self._executors[destination] = executor
+        return executor
+
+    async def _execute(self, plan: ActionPlan):
+        return await self._executor(plan.destination).run(plan)
+
+    async def start_recording(self, path: str):
+        await self.stop_recording()
+        recorder = TrafficRecorder(self.hass, path)
+        await recorder.async_start()
+        self._router.recorder = self._trigger_mux.recorder = recorder
+        _LOGGER.info("Recording link traffic to %s", path)
+
+    async def stop_recording(self):
+        if recorder := self._router.recorder:
+            self._router.recorder = self._trigger_mux.recorder = None
+            await recorder.async_stop()
+            _LOGGER.info("Recorded %s events to %s", recorder.events, recorder.path)
+            return dict(path=recorder.path, events=recorder.events)
+        return None
+
+    async def dispatch(self, plan: ActionPlan):
+        if self._queue:
+            return await self._queue.submit(plan)
+        return await self._execute(plan)
+
+    async def dispatch_group(self, plans: tuple):
+        if len(plans) == 1:
+            return (await self.dispatch(plans[0]) is True, )
+        results = await asyncio.gather(*[self.dispatch(plan) for plan in plans], return_exceptions=True)
+        for plan, result in zip(plans, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Action failed: %s, %s", plan, result)
+        return tuple(result is True for result in results)
+
+    async def call_action(self, action, extra, type=None):
+        plan = await self.compile_action(action, extra, type)
+        _LOGGER.debug("call_action: %s", plan)
+        await plan()
 
     async def subscribe(self, config: dict, cb):
-        states_map = dict()
-        triggers_map = dict()
-        async def on_state_change(entity_id, from_state, to_state):
-            _LOGGER.debug("on_state_change: %s %s - %s", entity_id, from_state, to_state)
-            domain = entity_id.split(".")[0]
-            if payload := states_map.get((entity_id, to_state.state)):
-                if from_state.state != to_state.state:
-                    await cb(payload[0], payload[1])
-            elif payload := states_map.get((entity_id, domain)):
-                await cb(payload[0], payload[1])
-            
-        async def on_trigger(vars, context=None):
-            if idx := vars.get("trigger", {}).get("idx"):
-                if payload := triggers_map.get(int(idx)):
-                    _LOGGER.debug("on_trigger: %s - %s, %s", vars, payload, idx)
-                    await cb(payload[0], payload[1])
-        states = set()
-        triggers = []
-        _remove_states = None
-        _remove_triggers = None
-        for key, item in config.items():
-            for idx, trigger in enumerate(item["trigger"]["triggers"]):
-                if "device_id" in trigger:
-                    triggers_map[len(triggers)] = (key, idx)
-                    triggers.append(trigger)
-                    _LOGGER.debug("Subscribe to trigger: %s, %s", trigger.get("subtype"), trigger.get("type"))
-                else:
-                    entity_id = trigger.get("entity_id")
-                    states.add(entity_id)
-                    states_map[(entity_id, trigger.get("state"))] = (key, idx)
-                    _LOGGER.debug("Subscribe to state: %s", entity_id)
-        if len(states):
-            _remove_states = async_track_state_change(self.hass, entity_ids=states, action=on_state_change)
-        if len(triggers):
-            _remove_triggers = await async_initialize_triggers(self.hass, triggers, on_trigger, DOMAIN, "name", _LOGGER.log)
-        # _LOGGER.debug("subscribe: %s, %s", states, triggers)
+        _remove = []
         def _remove_listeners():
-            _LOGGER.debug("Removing state listeners: %s", config)
-            if _remove_states:
-                _remove_states()
-            if _remove_triggers:
-                _remove_triggers()
+            _LOGGER.debug("Removing state listeners: %s", list(config))
+            for _remove_listener in _remove:
+                _remove_listener()
+        try:
+            for key, item in config.items():
+                for idx, trigger in enumerate(item["trigger"]["triggers"]):
+                    if "device_id" in trigger:
+                        _remove.append(await self._trigger_mux.attach(trigger, cb, key, idx))
+                    else:
+                        entity_id = trigger.get("entity_id")
+                        state = trigger.get("state") or trigger.get("domain")
+                        _remove.append(self._router.attach(entity_id, state, cb, key, idx))
+        except Exception:
+            _remove_listeners()
+            raise
         return _remove_listeners
 
-class Coordinator(DataUpdateCoordinator):
+class LinkShard:
+
+    def __init__(self, component: Component, entry) -> None:
+        self.hass = component.hass
+        self.entry = entry
+        self._component = component
+        self._storage = LinkStorage(self.hass, entry.entry_id)
+        self._links = LinkStore()
+        self._link_entities = dict()
+        self._mutations = []
+        self._mutation_task = None
+
+    @property
+    def id(self):
+        return self.entry.entry_id
+
+    @property
+    def links(self):
+        return self._links
+
+    @property
+    def coordinators(self):
+        return self.hass.data[DOMAIN]["entries"].get(self.id, {})
+
+    def as_dict(self):
+        return dict(title=self.entry.title, links=len(self._links))
+
+    async def async_setup(self):
+        items = await self._storage.async_load()
+        if items is None:
+            items = self.entry.data.get("entries", [])
+            _LOGGER.info("Migrating %s links from config entry to storage", len(items))
+            self._links = LinkStore(items)
+            await self._storage.async_save(self._links)
+            self.hass.config_entries.async_update_entry(self.entry, data={})
+        else:
+            self._links = LinkStore(items)
+        self.hass.data[DOMAIN]["entries"][self.id] = dict()
+        entities = []
+        _LOGGER.debug("Setup shard: %s, %s", self.id, len(self._links))
+        for item in self._links.values():
+            entities.append(await self._create_link(item))
+        await self._component.async_add_entities(entities)
+        self._component._notify_changes(list(self._links.ids()), [], [])
+
+    async def async_unload(self):
+        if self._mutation_task:
+            await asyncio.shield(self._mutation_task)
+        await self._storage.async_save(self._links)
+        ids = list(self._link_entities)
+        coordinators = list(self.coordinators.values())
+        for id in ids:
+            await self._remove_link(id)
+        await asyncio.gather(*[c.async_wait_activation() for c in coordinators])
+        _LOGGER.debug("Unload shard: %s, %s", self.id, len(ids))
+        self._component._notify_changes([], [], ids)
+
+    async def _create_link(self, item):
+        c = set_coordinator(self.hass, self._component, self.entry, item)
+        entity = BaseEntity(c)
+        self._link_entities[item["id"]] = entity
+        return entity
+
+    async def _remove_link(self, id: str):
+        self.coordinators.pop(id, None)
+        if entity := self._link_entities.pop(id, None):
+            await entity.async_remove()
+
+    def entity_id_by_id(self, id: str):
+        if entity := self._link_entities.get(id):
+            return entity.entity_id
+        return None
+
+    async def _prepare(self, operation: dict, staged: dict):
+        op = operation["op"]
+        if op == "create":
+            id = secrets.token_hex(8)
+            staged[id] = {**await self._component._build_entry(id, operation), "revision": 1}
+            return id
+        id = operation["entry_id"]
+        item = staged[id] if id in staged else self._links.get(id)
+        if not item:
+            raise HomeAssistantError("Link not found: %s" % (id))
+        revision = item.get("revision", 0)
+        if operation.get("revision") is not None and operation["revision"] != revision:
+            raise ConflictError("Link %s was changed: revision %s, expected %s" % (id, revision, operation["revision"]))
+        if op == "update":
+            staged[id] = {**await self._component._build_entry(id, operation), "revision": revision + 1}
+        elif op == "toggle":
+            staged[id] = {
+                **item,
+                "enabled": operation["enabled"],
+                "revision": revision + 1,
+            }
+        elif op == "delete":
+            staged[id] = None
+        return id
+
+    async def _commit(self, staged: dict):
+        entity_reg = await entity_registry.async_get_registry(self.hass)
+        for id, item in staged.items():
+            if item:
+                self._links.put(item)
+            elif self._links.remove(id):
+                if entity_id := self.entity_id_by_id(id):
+                    entity_reg.async_remove(entity_id)
+        await self.apply(staged.keys())
+
+    async def batch(self, operations: list):
+        future = self.hass.loop.create_future()
+        self._mutations.append((operations, future))
+        if not self._mutation_task:
+            self._mutation_task = self.hass.async_create_task(self._run_mutations())
+        return await future
+
+    async def _run_mutations(self):
+        try:
+            while len(self._mutations):
+                pending = self._mutations
+                self._mutations = []
+                staged = dict()
+                prepared = []
+                for operations, future in pending:
+                    local = dict(staged)
+                    try:
+                        ids = [await self._prepare(operation, local) for operation in operations]
+                    except Exception as err:
+                        if not future.done():
+                            future.set_exception(err)
+                        continue
+                    staged = local
+                    prepared.append((future, ids))
+                _LOGGER.debug("Mutations: %s, %s requests, %s links", self.id, len(pending), len(staged))
+                try:
+                    if len(staged):
+                        await self._commit(staged)
+                except Exception as err:
+                    for future, ids in prepared:
+                        if not future.done():
+                            future.set_exception(err)
+                    continue
+                for future, ids in prepared:
+                    if not future.done():
+                        future.set_result(ids)
+        finally:
+            self._mutation_task = None
+
+    def _persist(self):
+        self._storage.async_schedule_save(self._links)
+
+    async def apply(self, ids=None):
+        self._persist()
+        coordinators = self.coordinators
+        if ids is None:
+            ids = set(coordinators) | set(self._links.ids())
+        added = []
+        changed = []
+        removed = []
+        for id in ids:
+            item = self._links.get(id)
+            c = coordinators.get(id)
+            if not item:
+                if c:
+                    await self._remove_link(id)
+                    removed.append(id)
+            elif c:
+                if c.data is not item:
+                    await c.async_apply(item)
+                    changed.append(id)
+            else:
+                added.append(await self._create_link(item))
+        if len(added):
+            await self._component.async_add_entities(added)
+        _LOGGER.debug("apply: %s, added %s, changed %s, removed %s", self.id, len(added), len(changed), len(removed))
+        self._component._notify_changes([x.entry_id for x in added], changed, removed)
+
+class Coordinator:
+
+    __slots__ = ("hass", "stats", "_entry", "_data", "_component", "_remove_state_listeners", "_update_listener", "_generation", "_activation", "_stats_write")
 
     def __init__(self, hass, component: Component, entry, data: dict):
-        super().__init__(
-            hass,
-            _LOGGER,
-            name="Quick Automation",
-            update_method=self.async_update,
-            # update_interval=timedelta(seconds=30)
-        )
+        self.hass = hass
         self._entry = entry
         self._data = data
         self._component = component
+        self._remove_state_listeners = None
+        self._update_listener = None
+        self._generation = 0
+        self._activation = None
+        self._stats_write = None
+        self.stats = LinkStats()
         _LOGGER.debug("New Coordinator: %s", data["id"])
 
+    @property
+    def data(self):
+        return self._data
+
+    def active_config(self):
+        if not self._data["enabled"]:
+            return {}
+        return {key: item for key, item in self._data.get("config", {}).items() if item["enabled"]}
+
     async def enable(self):
-        _LOGGER.debug("Enable Coordinator: %s, %s", self._data["id"], self.hass.is_running)
-        self._remove_state_listeners = None
-        async def async_enable(_):
-            config = self._data.get("config", {})
-            _LOGGER.debug("HASS Started: %s", self._data["id"])
-            async def on_trigger(key: str, idx: int):
-                _LOGGER.debug("on_trigger:: %s, %s", key, idx)
-                if not self._data["enabled"]:
-                    return
-                if entry := config.get(key):
-                    if not entry["enabled"]:
-                        return
-                    action_type = None
-                    action_idx = idx
-                    if len(entry["action"]["actions"]) > 1:
-                        if entry["reverse"]:
-                            action_idx = 0 if idx == 1 else 1
-                        if key == "toggle":
-                            action_type = "toggle"
-                    _LOGGER.debug("Calling call_action: %s, %s, %s", action_idx, action_type, entry)
-                    await self._component.call_action(entry["action"]["actions"][action_idx], entry["extra"], action_type)
-            self._remove_state_listeners = await self._component.subscribe(config, on_trigger)
+        config = self.active_config()
+        _LOGGER.debug("Enable Coordinator: %s, %s, %s", self._data["id"], self.hass.is_running, list(config))
+        if not len(config):
+            return
         if self.hass.is_running:
-            await async_enable(None)
+            await self.async_activate(config)
         else:
-            self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, async_enable)
+            self._remove_state_listeners = self._component.schedule_activate(self)
+
+    @property
+    def generation(self):
+        return self._generation
+
+    async def async_activate(self, config: dict = None, generation: int = None):
+        if generation is None:
+            generation = self._generation
+        elif generation != self._generation:
+            return
+        activation = self._activation = self.hass.loop.create_future()
+        try:
+            await self._async_activate(self.active_config() if config is None else config, generation)
+        finally:
+            activation.set_result(None)
+            if self._activation is activation:
+                self._activation = None
+
+    async def async_wait_activation(self):
+        if self._activation:
+            await asyncio.shield(self._activation)
+
+    async def _async_activate(self, config: dict, generation: int):
+        _LOGGER.debug("Activate Coordinator: %s", self._data["id"])
+        plans = await self._component.compile_actions(config)
+        if generation != self._generation:
+            return
+        tracer = self._component.tracer
+        async def on_trigger(key: str, idx: int, received: float = None):
+            if group := plans.get((key, idx)):
+                dispatched = time.monotonic()
+                received = received or dispatched
+                results = (False, ) * len(group)
+                try:
+                    results = await self._component.dispatch_group(group)
+                finally:
+                    completed = time.monotonic()
+                    self.stats.record(received, dispatched, completed, group, results)
+                    self._schedule_stats_write()
+                    if tracer.enabled and tracer.wants(self._data):
+                        tracer.record(self._data, key, idx, group, received, dispatched, completed, results)
+        remove = await self._component.subscribe(config, on_trigger)
+        if generation != self._generation:
+            _LOGGER.debug("Drop stale activation: %s", self._data["id"])
+            remove()
+            return
+        self._remove_state_listeners = remove
 
     def disable(self):
+        self._generation += 1
         if self._remove_state_listeners:
             self._remove_state_listeners()
-
-    async def async_update(self):
-        return self._data
+            self._remove_state_listeners = None
+
+    @callback
+    def _schedule_stats_write(self):
+        if self._stats_write or not self._update_listener:
+            return
+        self._stats_write = self.hass.loop.call_later(_STATS_WRITE_INTERVAL, self._write_stats)
+
+    @callback
+    def _write_stats(self):
+        self._stats_write = None
+        if self._update_listener:
+            self._update_listener()
+
+    @callback
+    def async_set_update_listener(self, listener):
+        self._update_listener = listener
+
+        @callback
+        def _remove_listener():
+            self._update_listener = None
+            if self._stats_write:
+                self._stats_write.cancel()
+                self._stats_write = None
+        return _remove_listener
+
+    async def async_apply(self, data: dict):
+        _LOGGER.debug("Apply Coordinator: %s", data["id"])
+        self.disable()
+        self._data = data
+        if self._update_listener:
+            self._update_listener()
+        await self.enable()
 
     @property
     def entity_name(self):
@@ -438,10 +802,11 @@ class Coordinator(DataUpdateCoordinator):
     def unique_id(self):
         return "%s-%s" % (self._entry.entry_id, self.entity_id)
 
-class BaseEntity(CoordinatorEntity):
+class BaseEntity(Entity):
+
+    _attr_should_poll = False
 
     def __init__(self, coordinator: Coordinator):
-        super().__init__(coordinator)
         self._coordinator = coordinator
 
     @property
@@ -452,6 +817,10 @@ class BaseEntity(CoordinatorEntity):
     def icon(self):
         return "mdi:link-variant"
 
+    @property
+    def extra_state_attributes(self):
+        return self._coordinator.stats.attributes()
+
     @property
     def name(self) -> str:
         return self._coordinator.entity_name
@@ -465,7 +834,7 @@ class BaseEntity(CoordinatorEntity):
         return self._coordinator.entity_id
 
     async def async_added_to_hass(self):
-        await super().async_added_to_hass()
+        self.async_on_remove(self._coordinator.async_set_update_listener(self.async_write_ha_state))
         await self._coordinator.enable()
         self.async_on_remove(self._coordinator.disable)
 
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+_LOGGER = logging.getLogger(__name__)
+
+
+class ActionQueue:
+
+    def __init__(self, hass, interval: float, runner) -> None:
+        self.hass = hass
+        self._interval = interval
+        self._runner = runner
+        self._pending = dict()
+        self._workers = dict()
+        self.merged = 0
+        self.superseded = 0
+
+    async def submit(self, plan):
+        future = self.hass.loop.create_future()
+        destination = plan.destination
+        if pending := self._pending.get(destination):
+            if merged := pending[0].merge(plan):
+                pending[0] = merged
+                self.merged += 1
+            else:
+                pending[0] = plan
+                self.superseded += 1
+            pending[1].append(future)
+        else:
+            self._pending[destination] = [plan, [future]]
+        if destination not in self._workers:
+            self._workers[destination] = self.hass.async_create_task(self._run(destination))
+        return await future
+
+    async def _run(self, destination: str):
+        try:
+            while pending := self._pending.pop(destination, None):
+                plan, futures = pending
+                _LOGGER.debug("Queue call: %s, coalesced: %s", plan, len(futures))
+                try:
+                    result = await self._runner(plan)
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(result)
+                except Exception as err:
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(err)
+                if self._interval > 0:
+                    await asyncio.sleep(self._interval)
+        finally:
+            self._workers.pop(destination, None)
+
+    @property
+    def stats(self):
+        return dict(pending=len(self._pending), merged=self.merged, superseded=self.superseded)
+
+
+class DestinationExecutor:
+
+    def __init__(self, destination: str, timeout: float, concurrency: int, max_pending: int, failures: int, cooldown: float) -> None:
+        self.destination = destination
+        self._timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._concurrency = concurrency
+        self._max_pending = max_pending
+        self._max_failures = failures
+        self._cooldown = cooldown
+        self._active = 0
+        self._failures = 0
+        self._open_until = 0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def _failed(self):
+        self._failures += 1
+        if self._failures >= self._max_failures:
+            self._open_until = time.monotonic() + self._cooldown
+            _LOGGER.warning("Destination %s failed %s times in a row, pausing for %ss", self.destination, self._failures, self._cooldown)
+
+    async def run(self, plan):
+        if self._open_until:
+            if time.monotonic() < self._open_until:
+                self.rejected += 1
+                return False
+            self._open_until = 0
+            self._failures = self._max_failures - 1
+        if self._active >= self._concurrency + self._max_pending:
+            self.dropped += 1
+            _LOGGER.debug("Destination %s is busy, dropping: %s", self.destination, plan)
+            return False
+        self._active += 1
+        try:
+            async with self._semaphore:
+                self.calls += 1
+                try:
+                    await asyncio.wait_for(plan(), self._timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    self._failed()
+                    _LOGGER.warning("Action timed out after %ss: %s", self._timeout, plan)
+                    return False
+                except Exception:
+                    self.errors += 1
+                    self._failed()
+                    raise
+                self._failures = 0
+                return True
+        finally:
+            self._active -= 1
+
+    @property
+    def stats(self):
+        return dict(
+            calls=self.calls,
+            errors=self.errors,
+            timeouts=self.timeouts,
+            dropped=self.dropped,
+            rejected=self.rejected,
+            open=self._open_until > time.monotonic(),
+        )
@@ -1,2 +1,89 @@
+from homeassistant.components.http import HomeAssistantView
+from aiohttp import web, hdrs
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+_LOGGER = logging.getLogger(__name__)
+
+URL_BASE = "/quick_automation_ui"
+_MODULE = "index.js"
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_IMMUTABLE = "public, max-age=31536000, immutable"
+
+
 def locate_dir():
     return __path__[0]
+
+
+def _read(path: str):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def load_assets(dist: str):
+    body = _read(os.path.join(dist, _MODULE))
+    digest = hashlib.sha256(body).hexdigest()
+    variants = dict()
+    try:
+        manifest = json.loads(_read(os.path.join(dist, "manifest.json")))
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get(_MODULE) == digest:
+        for encoding, suffix in _ENCODINGS:
+            path = os.path.join(dist, _MODULE + suffix)
+            if os.path.isfile(path):
+                variants[encoding] = _read(path)
+    else:
+        _LOGGER.debug("Precompressed panel assets are stale or missing: %s", dist)
+    if "gzip" not in variants:
+        variants["gzip"] = gzip.compress(body, 9)
+    return PanelAssets(digest[:16], body, variants)
+
+
+class PanelAssets:
+
+    def __init__(self, version: str, body: bytes, variants: dict) -> None:
+        self.version = version
+        self.body = body
+        self.variants = variants
+
+    @property
+    def module_url(self):
+        return "%s/%s/%s" % (URL_BASE, self.version, _MODULE)
+
+    def select(self, accept_encoding: str):
+        accepted = {x.split(";")[0].strip().lower() for x in accept_encoding.split(",")}
+        for encoding, _ in _ENCODINGS:
+            if encoding in accepted and encoding in self.variants:
+                return encoding, self.variants[encoding]
+        return None, self.body
+
+
+class PanelAssetView(HomeAssistantView):
+
+    url = URL_BASE + "/{version}/{filename}"
+    name = "quick_automation:panel"
+    requires_auth = False
+
+    def __init__(self, assets: PanelAssets) -> None:
+        self._assets = assets
+
+    async def get(self, request, version: str, filename: str):
+        if filename != _MODULE:
+            raise web.HTTPNotFound()
+        if version != self._assets.version:
+            raise web.HTTPFound(self._assets.module_url)
+        headers = {
+            hdrs.CACHE_CONTROL: _IMMUTABLE,
+            hdrs.ETAG: '"%s"' % (self._assets.version),
+            hdrs.VARY: hdrs.ACCEPT_ENCODING,
+        }
+        if request.headers.get(hdrs.IF_NONE_MATCH) == headers[hdrs.ETAG]:
+            return web.Response(status=304, headers=headers)
+        encoding, body = self._assets.select(request.headers.get(hdrs.ACCEPT_ENCODING, ""))
+        if encoding:
+            headers[hdrs.CONTENT_ENCODING] = encoding
+        return web.Response(body=body, content_type="application/javascript", charset="utf-8", headers=headers)
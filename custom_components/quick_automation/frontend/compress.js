@@ -0,0 +1,17 @@
+import { createHash } from 'crypto';
+import { readFileSync, writeFileSync } from 'fs';
+import { gzipSync, brotliCompressSync, constants } from 'zlib';
+
+const dist = (name) => new URL(`./dist/${name}`, import.meta.url);
+const data = readFileSync(dist('index.js'));
+
+writeFileSync(dist('index.js.gz'), gzipSync(data, { level: 9 }));
+writeFileSync(dist('index.js.br'), brotliCompressSync(data, {
+    params: {
+        [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+        [constants.BROTLI_PARAM_SIZE_HINT]: data.length,
+    }
+}));
+writeFileSync(dist('manifest.json'), JSON.stringify({
+    'index.js': createHash('sha256').update(data).digest('hex'),
+}, null, 2) + '\n');
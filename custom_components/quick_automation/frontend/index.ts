@@ -24,7 +24,9 @@ export class QuickAutomationPanel extends LitElement {
     panel: object
 
     @state()
-    private _items: object[] | undefined = undefined;
+    private _items: EntryRecord[] | undefined = undefined;
+
+    private _unsubscribe: Promise<() => void> | undefined = undefined;
 
     @state()
     private _editor: EntryRecord | undefined = undefined;
@@ -76,7 +78,8 @@ export class QuickAutomationPanel extends LitElement {
                         .filter((item) => item.enabled)
                         .map((item) => configBlocks[item.type].title + (item.reverse? ' (Reversed)': ''))
                         .join(', ')
-                    return html`${details}`;
+                    const count = asList(row.destination).length;
+                    return html`${details}${count > 1? ` → ${count} destinations`: ''}`;
                 }
             };
         }
@@ -117,37 +120,77 @@ export class QuickAutomationPanel extends LitElement {
         return columns;
     }
 
+    async _send(message: object) {
+        try {
+            await this.hass.connection.sendMessagePromise(message);
+        } catch (err: any) {
+            console.error("Request failed:", message, err);
+            this.dispatchEvent(new CustomEvent("hass-notification", {
+                detail: {
+                    message: `${err.message || err.code}. The list shows the latest version, please try again.`,
+                },
+                bubbles: true,
+                composed: true,
+            }));
+        }
+    }
+
     async _remove(row: EntryRecord) {
-        await this.hass.connection.sendMessagePromise({
+        await this._send({
             type: 'quick_automation/remove_entry',
             entry_id: row.entry_id,
+            revision: row.revision,
         });
-        this._load();
     }
 
     async _toggle(row: EntryRecord) {
-        await this.hass.connection.sendMessagePromise({
+        await this._send({
             type: 'quick_automation/toggle_enabled',
             entry_id: row.entry_id,
             enabled: !row.enabled,
+            revision: row.revision,
         });
-        this._load();
     }
 
-    async _load() {
-        const resp = await this.hass.connection.sendMessagePromise({
-            type: 'quick_automation/list',
-        });
-        console.log('_load:', resp);
-        this._items = resp;
+    connectedCallback() {
+        super.connectedCallback();
+        this._subscribe();
     }
 
-    _getItems(): object[] {
-        if (this._items) {
-            return this._items;
+    disconnectedCallback() {
+        super.disconnectedCallback();
+        if (this._unsubscribe) {
+            this._unsubscribe.then((unsubscribe) => unsubscribe());
+            this._unsubscribe = undefined;
         }
-        this._load();
-        return [];
+    }
+
+    protected willUpdate(props: Map<string, unknown>): void {
+        if (props.has("hass")) {
+            this._subscribe();
+        }
+    }
+
+    _subscribe() {
+        if (this._unsubscribe || !this.hass) {
+            return;
+        }
+        this._items = undefined;
+        this._unsubscribe = this.hass.connection.subscribeMessage(
+            (event: ChangeEvent) => this._applyChanges(event),
+            {type: 'quick_automation/subscribe'},
+        );
+    }
+
+    _applyChanges(event: ChangeEvent) {
+        const items = new Map((this._items || []).map((item): [string, EntryRecord] => [item.entry_id, item]));
+        event.removed.forEach((id) => items.delete(id));
+        [...event.added, ...event.changed].forEach((item) => items.set(item.entry_id, item));
+        this._items = [...items.values()];
+    }
+
+    _getItems(): object[] {
+        return this._items || [];
     }
 
     _edit(row: EntryRecord) {
@@ -177,11 +220,11 @@ export class QuickAutomationPanel extends LitElement {
     async _save(event: any) {
         const entry = event.detail;
         console.log("On save:", entry);
-        await this.hass.connection.sendMessagePromise({
+        await this._send({
             type: 'quick_automation/update_entry',
             ...entry,
+            revision: entry.revision,
         });
-        this._load();
     }
 
     render() {
@@ -236,13 +279,20 @@ type Link = {
 
 type EntryRecord = {
     entry_id: string | undefined;
+    revision?: number;
     title: string;
     enabled: boolean;
     source: DeviceEntity;
-    destination: DeviceEntity;
+    destination: DeviceEntity | DeviceEntity[];
     links: Link[];
 };
 
+type ChangeEvent = {
+    added: EntryRecord[];
+    changed: EntryRecord[];
+    removed: string[];
+};
+
 const configBlocks: {
     [id: string]: {
         title: string;
@@ -269,6 +319,18 @@ const configBlocks: {
     },
 };
 
+const asList = (value: any): any[] => value? (Array.isArray(value)? value: [value]): [];
+
+const targetItems = (value: any): DeviceEntity[] => [
+    ...asList(value && value.device_id).map((device_id) => ({device_id})),
+    ...asList(value && value.entity_id).map((entity_id) => ({entity_id})),
+];
+
+const targetValue = (target: DeviceEntity | DeviceEntity[]) => ({
+    device_id: asList(target).map((item) => item.device_id).filter((id) => id),
+    entity_id: asList(target).map((item) => item.entity_id).filter((id) => id),
+});
+
 @customElement("quick-automation-editor")
 export class SuperGroupsEditor extends LitElement {
 
@@ -323,33 +385,20 @@ export class SuperGroupsEditor extends LitElement {
         target: {},
     };
 
-    targetSet(target: DeviceEntity) {
-        return target.entity_id || target.device_id? true: false;
+    targetSet(target: DeviceEntity | DeviceEntity[]) {
+        return asList(target).some((item) => item.entity_id || item.device_id);
     }
 
-    async _updateTarget(value: DeviceEntity | undefined, name: string) {
-        const oneItem = (value: any) => Array.isArray(value)? value[value.length-1]: value;
+    async _updateTarget(value: any, name: string) {
+        const items = targetItems(value);
+        let target: DeviceEntity | DeviceEntity[] = items.length? items[items.length-1]: {};
+        if (name == 'destination' && items.length > 1) {
+            target = items;
+        }
         this._data = {
             ...this._data,
-            [name]: {
-            },
-        };    
-        if (value && value.device_id) {
-            this._data = {
-                ...this._data,
-                [name]: {
-                    device_id: oneItem(value.device_id),
-                },
-            };    
-        }
-        if (value && value.entity_id) {
-            this._data = {
-                ...this._data,
-                [name]: {
-                    entity_id: oneItem(value.entity_id),
-                },
-            };    
-        }
+            [name]: target,
+        };
         if (this.targetSet(this._data.source) && this.targetSet(this._data.destination)) {
             await this._loadTriggerActions();
         }
@@ -514,10 +563,10 @@ export class SuperGroupsEditor extends LitElement {
                     <div>
                         <p>Destination:</p>
                         <ha-selector
-                            label="Source"
+                            label="Destination"
                             .hass=${this.hass}
                             .selector=${this._destinationSelector}
-                            .value=${this._data.destination}
+                            .value=${targetValue(this._data.destination)}
                             @value-changed=${this._onDestinationChanged}
                         >
                         </ha-selector-target>
@@ -0,0 +1,104 @@
+from .constants import DOMAIN
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 2
+
+
+def item_key(item: dict):
+    if not item:
+        return None
+    return item.get("device_id") or item.get("entity_id")
+
+
+def item_list(value):
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class LinkStore:
+
+    def __init__(self, items=()) -> None:
+        self._links = dict()
+        self._by_source = dict()
+        self._by_destination = dict()
+        for item in items:
+            self.put(item)
+
+    def _index(self, index: dict, value, id: str):
+        for item in item_list(value):
+            if key := item_key(item):
+                index.setdefault(key, dict())[id] = None
+
+    def _unindex(self, index: dict, value, id: str):
+        for item in item_list(value):
+            if ids := index.get(item_key(item)):
+                ids.pop(id, None)
+                if not len(ids):
+                    index.pop(item_key(item))
+
+    def put(self, link: dict):
+        id = link["id"]
+        if old := self._links.get(id):
+            self._unindex(self._by_source, old.get("source"), id)
+            self._unindex(self._by_destination, old.get("destination"), id)
+        self._links[id] = link
+        self._index(self._by_source, link.get("source"), id)
+        self._index(self._by_destination, link.get("destination"), id)
+        return old
+
+    def remove(self, id: str):
+        if link := self._links.pop(id, None):
+            self._unindex(self._by_source, link.get("source"), id)
+            self._unindex(self._by_destination, link.get("destination"), id)
+        return link
+
+    def get(self, id: str):
+        return self._links.get(id)
+
+    def by_source(self, key: str):
+        return [self._links[id] for id in self._by_source.get(key, {})]
+
+    def by_destination(self, key: str):
+        return [self._links[id] for id in self._by_destination.get(key, {})]
+
+    def ids(self):
+        return self._links.keys()
+
+    def values(self):
+        return self._links.values()
+
+    def as_list(self):
+        return list(self._links.values())
+
+    def __contains__(self, id: str):
+        return id in self._links
+
+    def __len__(self):
+        return len(self._links)
+
+
+class LinkStorage:
+
+    def __init__(self, hass, entry_id: str) -> None:
+        self._store = Store(hass, STORAGE_VERSION, "%s.%s" % (DOMAIN, entry_id))
+
+    async def async_load(self):
+        if data := await self._store.async_load():
+            return list(data.get("links", {}).values())
+        return None
+
+    def _data(self, links: LinkStore):
+        return dict(links={link["id"]: link for link in links.values()})
+
+    async def async_save(self, links: LinkStore):
+        await self._store.async_save(self._data(links))
+
+    @callback
+    def async_schedule_save(self, links: LinkStore):
+        self._store.async_delay_save(lambda: self._data(links), SAVE_DELAY)
+
+    async def async_remove(self):
+        await self._store.async_remove()
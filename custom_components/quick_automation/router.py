@@ -0,0 +1,197 @@
+from .constants import DOMAIN
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.trigger import async_initialize_triggers
+
+import asyncio
+import gzip
+import json
+import logging
+import time
+_LOGGER = logging.getLogger(__name__)
+
+
+class StateRouter:
+
+    def __init__(self, hass) -> None:
+        self.hass = hass
+        self._index = dict()
+        self._listeners = dict()
+        self.recorder = None
+
+    @callback
+    def attach(self, entity_id: str, state: str, cb, key: str, idx: int):
+        token = object()
+        handlers = self._index.setdefault((entity_id, state), dict())
+        handlers[token] = (cb, key, idx)
+        if listener := self._listeners.get(entity_id):
+            listener[1] += 1
+        else:
+            self._listeners[entity_id] = [async_track_state_change_event(self.hass, [entity_id], self._on_state_change), 1]
+        _LOGGER.debug("Subscribe to state: %s", entity_id)
+
+        @callback
+        def _detach():
+            self.detach(entity_id, state, token)
+        return _detach
+
+    @callback
+    def detach(self, entity_id: str, state: str, token):
+        handlers = self._index.get((entity_id, state), {})
+        if handlers.pop(token, None) is None:
+            return
+        if not len(handlers):
+            self._index.pop((entity_id, state))
+        if listener := self._listeners.get(entity_id):
+            listener[1] -= 1
+            if listener[1] == 0:
+                self._listeners.pop(entity_id)[0]()
+
+    @callback
+    def _dispatch(self, handlers):
+        received = time.monotonic()
+        for cb, key, idx in list(handlers.values()):
+            self.hass.async_create_task(cb(key, idx, received))
+
+    @callback
+    def _on_state_change(self, event):
+        from_state = event.data.get("old_state")
+        to_state = event.data.get("new_state")
+        if from_state is None or to_state is None or from_state.state == to_state.state:
+            return
+        entity_id = event.data["entity_id"]
+        if self.recorder:
+            self.recorder.state(entity_id, from_state.state, to_state.state)
+        if handlers := self._index.get((entity_id, to_state.state)):
+            self._dispatch(handlers)
+        elif handlers := self._index.get((entity_id, entity_id.split(".")[0])):
+            self._dispatch(handlers)
+
+    @property
+    def stats(self):
+        return dict(entities=len(self._listeners), keys=len(self._index))
+
+
+def _trigger_key(trigger: dict):
+    return json.dumps(trigger, sort_keys=True, default=str)
+
+
+class TriggerMultiplexer:
+
+    def __init__(self, hass) -> None:
+        self.hass = hass
+        self._triggers = dict()
+        self.recorder = None
+
+    async def attach(self, trigger: dict, cb, key: str, idx: int):
+        trigger_key = _trigger_key(trigger)
+        token = object()
+        if entry := self._triggers.get(trigger_key):
+            entry["subscribers"][token] = (cb, key, idx)
+        else:
+            entry = dict(subscribers={token: (cb, key, idx)}, remove=None)
+            self._triggers[trigger_key] = entry
+
+            async def on_trigger(vars, context=None):
+                received = time.monotonic()
+                if self.recorder:
+                    self.recorder.trigger(trigger_key, trigger)
+                for _cb, _key, _idx in list(entry["subscribers"].values()):
+                    self.hass.async_create_task(_cb(_key, _idx, received))
+            _LOGGER.debug("Subscribe to trigger: %s, %s", trigger.get("subtype"), trigger.get("type"))
+            try:
+                remove = await async_initialize_triggers(self.hass, [trigger], on_trigger, DOMAIN, "name", _LOGGER.log)
+            except Exception:
+                if self._triggers.get(trigger_key) is entry:
+                    self._triggers.pop(trigger_key)
+                raise
+            if self._triggers.get(trigger_key) is entry:
+                entry["remove"] = remove
+            elif remove:
+                remove()
+
+        @callback
+        def _detach():
+            self.detach(trigger_key, token)
+        return _detach
+
+    @callback
+    def detach(self, trigger_key: str, token):
+        entry = self._triggers.get(trigger_key)
+        if not entry or entry["subscribers"].pop(token, None) is None:
+            return
+        if not len(entry["subscribers"]):
+            self._triggers.pop(trigger_key)
+            _LOGGER.debug("Unsubscribe from trigger: %s", trigger_key)
+            if entry["remove"]:
+                entry["remove"]()
+
+    @property
+    def stats(self):
+        return dict(triggers=len(self._triggers))
+
+
+class TrafficRecorder:
+
+    FLUSH_SIZE = 200
+
+    def __init__(self, hass, path: str) -> None:
+        self.hass = hass
+        self.path = path
+        self._start = time.monotonic()
+        self._lines = []
+        self._keys = dict()
+        self._lock = asyncio.Lock()
+        self._tasks = set()
+        self._mode = "wt"
+        self.events = 0
+
+    def _append(self, line: list):
+        self._lines.append(json.dumps(line, separators=(",", ":")))
+        if len(self._lines) >= self.FLUSH_SIZE:
+            self.async_flush()
+
+    def _offset(self):
+        return round(time.monotonic() - self._start, 4)
+
+    @callback
+    def state(self, entity_id: str, from_state: str, to_state: str):
+        self.events += 1
+        self._append([self._offset(), "s", entity_id, from_state, to_state])
+
+    @callback
+    def trigger(self, trigger_key: str, trigger: dict):
+        self.events += 1
+        if (idx := self._keys.get(trigger_key)) is None:
+            idx = len(self._keys)
+            self._keys[trigger_key] = idx
+            self._append([None, "k", idx, {k: trigger.get(k) for k in ("device_id", "domain", "type", "subtype") if k in trigger}])
+        self._append([self._offset(), "t", idx])
+
+    def _write(self, lines: list, mode: str):
+        with gzip.open(self.path, mode) as f:
+            if len(lines):
+                f.write("\n".join(lines) + "\n")
+
+    async def _async_write(self, lines: list):
+        async with self._lock:
+            mode, self._mode = self._mode, "at"
+            await self.hass.async_add_executor_job(self._write, lines, mode)
+
+    @callback
+    def async_flush(self):
+        if not len(self._lines):
+            return
+        lines = self._lines
+        self._lines = []
+        task = self.hass.async_create_task(self._async_write(lines))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def async_start(self):
+        await self._async_write([])
+
+    async def async_stop(self):
+        self.async_flush()
+        if len(self._tasks):
+            await asyncio.gather(*list(self._tasks))
@@ -0,0 +1,184 @@
+from homeassistant.util.yaml import load_yaml
+
+import voluptuous as vol
+
+import logging
+import os
+_LOGGER = logging.getLogger(__name__)
+
+RULES_FILE = "quick_automation_rules.yaml"
+
+_FIELDS = ("domain", "type", "subtype")
+
+_ON_OFF_ACTIONS = [
+    (dict(type="turned_on"), dict(type="turned_off")),
+    (dict(domain="mqtt", type="action", subtype="on"), dict(domain="mqtt", type="action", subtype="off")),
+    (dict(domain="mqtt", type="action", subtype="open"), dict(domain="mqtt", type="action", subtype="close")),
+    (dict(domain="zha", type="remote_button_short_press", subtype="open"), dict(domain="zha", type="remote_button_short_press", subtype="close")),
+    (dict(domain="zha", type="remote_button_short_press", subtype="turn_on"), dict(domain="zha", type="remote_button_short_press", subtype="turn_off")),
+]
+_BRIGHTNESS_ACTIONS = [
+    (dict(domain="mqtt", type="action", subtype="brightness_move_up"), dict(domain="mqtt", type="action", subtype="brightness_move_down")),
+    (dict(domain="zha", type="remote_button_long_press", subtype="dim_up"), dict(domain="zha", type="remote_button_long_press", subtype="dim_down")),
+    (dict(domain="zha", type="remote_button_long_press", subtype="open"), dict(domain="zha", type="remote_button_long_press", subtype="close")),
+]
+_LEFT_RIGHT_ACTIONS = [
+    (dict(domain="mqtt", type="action", subtype="arrow_left_click"), dict(domain="mqtt", type="action", subtype="arrow_right_click")),
+    (dict(domain="zha", type="remote_button_short_press", subtype="left"), dict(domain="zha", type="remote_button_short_press", subtype="right")),
+]
+_TOGGLE_ACTIONS = [
+    (dict(domain="mqtt", type="action", subtype="toggle"), dict(domain="mqtt", type="action")),
+    (dict(domain="mqtt", type="action", subtype="single"), dict(domain="mqtt", type="action")),
+    (dict(domain="zha", type="remote_button_short_press", subtype="remote_button_short_press"), dict(domain="zha", type="remote_button_short_press")),
+    (dict(domain="zha", type="remote_button_short_press", subtype="turn_on"), dict(domain="zha", type="remote_button_short_press")),
+]
+
+_DEVICE_ACTIONS = dict(
+    toggle=[(dict(type="toggle"), ), (dict(type="press"), )],
+    on_off=[(dict(type="turn_on"), dict(type="turn_off")), (dict(type="open"), dict(type="close"))],
+    brightness=[(dict(type="brightness_increase"), dict(type="brightness_decrease"))],
+)
+
+_BINARY_SENSOR_TRIGGERS = ["co", "cold", "connected", "gas", "hot", "light", "locked", "moist", "motion", "moving", "occupied", "plugged_in", "present", "problem", "running", "unsafe", "smoke", "sound", "tampered", "vibration", "opened"]
+
+_PATTERN_SCHEMA = vol.Schema({
+    vol.Optional("domain"): str,
+    vol.Optional("type"): str,
+    vol.Optional("subtype"): str,
+})
+_PAIR_SCHEMA = vol.All([_PATTERN_SCHEMA], vol.Length(min=2, max=2))
+RULES_SCHEMA = vol.Schema({
+    vol.Optional("triggers", default={}): vol.Schema({
+        vol.Optional("on_off", default=[]): [_PAIR_SCHEMA],
+        vol.Optional("brightness", default=[]): [_PAIR_SCHEMA],
+        vol.Optional("left_right", default=[]): [_PAIR_SCHEMA],
+        vol.Optional("toggle", default=[]): [_PAIR_SCHEMA],
+    }),
+    vol.Optional("actions", default={}): vol.Schema({
+        vol.Optional("on_off", default=[]): [_PAIR_SCHEMA],
+        vol.Optional("brightness", default=[]): [_PAIR_SCHEMA],
+        vol.Optional("toggle", default=[]): [vol.All([_PATTERN_SCHEMA], vol.Length(min=1, max=1))],
+    }),
+})
+
+
+def _compile(pattern: dict):
+    return (pattern.get("domain"), pattern.get("type"), pattern.get("subtype"))
+
+
+def _mask(key: tuple):
+    return (key[0] is not None, key[1] is not None, key[2] is not None)
+
+
+class TriggerIndex:
+
+    def __init__(self, items, masks=()) -> None:
+        self._items = [(_compile(item), item) for item in items or []]
+        self._index = dict()
+        for mask in masks:
+            self._build(mask)
+
+    def _build(self, mask: tuple):
+        index = self._index[mask] = dict()
+        use_domain, use_type, use_subtype = mask
+        for (domain, type, subtype), item in self._items:
+            key = (domain if use_domain else None, type if use_type else None, subtype if use_subtype else None)
+            if (items := index.get(key)) is None:
+                index[key] = [item]
+            else:
+                items.append(item)
+        return index
+
+    def all(self, key: tuple):
+        if (index := self._index.get(_mask(key))) is None:
+            index = self._build(_mask(key))
+        return index.get(key, [])
+
+    def first(self, key: tuple):
+        if items := self.all(key):
+            return items[0]
+        return None
+
+
+class RuleSet:
+
+    def __init__(self, rules: dict = None) -> None:
+        rules = RULES_SCHEMA(rules or {})
+        triggers = rules["triggers"]
+        actions = rules["actions"]
+        self._trigger_pairs = [
+            (name, _compile(p1), _compile(p2)) for name, table in (
+                ("on_off", _ON_OFF_ACTIONS + triggers["on_off"]),
+                ("brightness", _BRIGHTNESS_ACTIONS + triggers["brightness"]),
+                ("left_right", _LEFT_RIGHT_ACTIONS + triggers["left_right"]),
+            ) for p1, p2 in table
+        ]
+        self._trigger_toggles = [(_compile(p1), _compile(p2)) for p1, p2 in _TOGGLE_ACTIONS + triggers["toggle"]]
+        self._action_toggles = [_compile(p[0]) for p in actions["toggle"] + _DEVICE_ACTIONS["toggle"]]
+        self._action_pairs = [
+            (name, _compile(p1), _compile(p2)) for name in ("on_off", "brightness")
+            for p1, p2 in _DEVICE_ACTIONS[name] + actions[name]
+        ]
+        self._binary_sensor = _compile(dict(domain="binary_sensor"))
+        self._cover_position = _compile(dict(domain="cover", type="set_position"))
+        self._trigger_masks = {_mask(p) for _, p1, p2 in self._trigger_pairs for p in (p1, p2)}
+        self._trigger_masks |= {_mask(p) for pair in self._trigger_toggles for p in pair}
+        self._trigger_masks.add(_mask(self._binary_sensor))
+        self._action_masks = {_mask(p) for _, p1, p2 in self._action_pairs for p in (p1, p2)}
+        self._action_masks |= {_mask(p) for p in self._action_toggles}
+        self._action_masks.add(_mask(self._cover_position))
+
+    def _pairs(self, index: TriggerIndex, pairs, key: str, result: dict):
+        for name, p1, p2 in pairs:
+            t1 = index.first(p1)
+            t2 = index.first(p2)
+            if t1 and t2:
+                result[name] = {key: [t1, t2]}
+
+    def _binary_sensor_pair(self, index: TriggerIndex):
+        type_map = {x["type"]: x for x in index.all(self._binary_sensor)}
+        for item in _BINARY_SENSOR_TRIGGERS:
+            if value := type_map.get(item):
+                if other := type_map.get(f"no_{item}", type_map.get(f"not_{item}")):
+                    return dict(triggers=[value, other])
+        return None
+
+    def resolve_triggers(self, t_list):
+        index = TriggerIndex(t_list, self._trigger_masks)
+        result = dict()
+        self._pairs(index, self._trigger_pairs, "triggers", result)
+        if "on_off" not in result:
+            if pair := self._binary_sensor_pair(index):
+                result["on_off"] = pair
+        for p1, p2 in self._trigger_toggles:
+            actions = index.all(p2)
+            if t := index.first(p1):
+                result["toggle"] = dict(triggers=[t], select=actions, key="subtype")
+            if "toggle" not in result and len(actions):
+                result["toggle"] = dict(triggers=[actions[0]], select=actions, key="subtype")
+        return result
+
+    def resolve_actions(self, a_list):
+        index = TriggerIndex(a_list, self._action_masks)
+        result = dict()
+        for pattern in self._action_toggles:
+            if action := index.first(pattern):
+                result["toggle"] = dict(actions=[action])
+                break
+        self._pairs(index, self._action_pairs, "actions", result)
+        if "on_off" not in result:
+            if action := index.first(self._cover_position):
+                result["on_off"] = dict(actions=[{**action, "position": 100}, {**action, "position": 0}])
+        return result
+
+
+def load_rules(path: str) -> RuleSet:
+    if not os.path.isfile(path):
+        return RuleSet()
+    try:
+        rules = RuleSet(load_yaml(path))
+        _LOGGER.info("Loaded link rules from %s", path)
+        return rules
+    except Exception:
+        _LOGGER.exception("Invalid link rules file: %s", path)
+        return RuleSet()
@@ -0,0 +1,75 @@
+from bisect import bisect_left
+
+_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class Histogram:
+
+    __slots__ = ("counts", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(_BUCKETS) + 1)
+        self.count = 0
+
+    def add(self, ms: float):
+        self.counts[bisect_left(_BUCKETS, ms)] += 1
+        self.count += 1
+
+    def percentile(self, p: float):
+        if not self.count:
+            return None
+        limit = p * self.count
+        total = 0
+        for idx, value in enumerate(self.counts):
+            total += value
+            if total >= limit:
+                return _BUCKETS[idx] if idx < len(_BUCKETS) else None
+        return None
+
+    def as_dict(self):
+        return dict(
+            p50=self.percentile(0.5),
+            p95=self.percentile(0.95),
+            p99=self.percentile(0.99),
+        )
+
+
+class LinkStats:
+
+    __slots__ = ("fires", "errors", "dispatch", "total", "destinations")
+
+    def __init__(self) -> None:
+        self.fires = 0
+        self.errors = 0
+        self.dispatch = Histogram()
+        self.total = Histogram()
+        self.destinations = dict()
+
+    def record(self, received: float, dispatched: float, completed: float, plans: tuple = (), results: tuple = ()):
+        self.fires += 1
+        if not all(results):
+            self.errors += 1
+        for plan, ok in zip(plans, results):
+            counts = self.destinations.setdefault(plan.destination, [0, 0])
+            counts[0] += 1
+            if not ok:
+                counts[1] += 1
+        self.dispatch.add((dispatched - received) * 1000)
+        self.total.add((completed - received) * 1000)
+
+    def as_dict(self):
+        return dict(
+            fires=self.fires,
+            errors=self.errors,
+            dispatch_ms=self.dispatch.as_dict(),
+            total_ms=self.total.as_dict(),
+            destinations={id: dict(fires=x[0], errors=x[1]) for id, x in self.destinations.items()},
+        )
+
+    def attributes(self):
+        return dict(
+            fires=self.fires,
+            errors=self.errors,
+            latency_p50_ms=self.total.percentile(0.5),
+            latency_p95_ms=self.total.percentile(0.95),
+        )
@@ -0,0 +1,68 @@
+from .links import item_key, item_list
+
+from collections import deque
+import time
+
+DEFAULT_SIZE = 200
+
+
+def _outcome(results: tuple):
+    if all(results):
+        return "ok"
+    return "partial" if any(results) else "error"
+
+
+class LinkTracer:
+
+    def __init__(self, size: int = DEFAULT_SIZE) -> None:
+        self.enabled = False
+        self._link_id = None
+        self._device_id = None
+        self._buffer = deque(maxlen=size)
+
+    def configure(self, enabled: bool, link_id: str = None, device_id: str = None, size: int = None):
+        self.enabled = enabled
+        self._link_id = link_id
+        self._device_id = device_id
+        if size and size != self._buffer.maxlen:
+            self._buffer = deque(self._buffer, maxlen=size)
+        if not enabled:
+            self._buffer.clear()
+
+    def wants(self, link: dict):
+        if self._link_id and link["id"] != self._link_id:
+            return False
+        if self._device_id:
+            keys = [item_key(link.get("source"))] + [item_key(x) for x in item_list(link.get("destination"))]
+            return self._device_id in keys
+        return True
+
+    def record(self, link: dict, key: str, idx: int, group: tuple, received: float, dispatched: float, completed: float, results: tuple):
+        config = link.get("config", {}).get(key, {})
+        triggers = config.get("trigger", {}).get("triggers", [])
+        self._buffer.append(dict(
+            time=time.time() - (time.monotonic() - received),
+            link_id=link["id"],
+            type=key,
+            trigger=triggers[idx] if idx < len(triggers) else None,
+            trigger_idx=idx,
+            action_idx=group[0].index if len(group) else None,
+            reverse=config.get("reverse", False),
+            actions=[repr(plan) for plan in group],
+            outcome=_outcome(results),
+            destinations=[dict(destination=plan.destination, outcome="ok" if ok else "error") for plan, ok in zip(group, results)],
+            dispatch_ms=round((dispatched - received) * 1000, 3),
+            total_ms=round((completed - received) * 1000, 3),
+        ))
+
+    def entries(self):
+        return list(self._buffer)
+
+    def as_dict(self):
+        return dict(
+            enabled=self.enabled,
+            link_id=self._link_id,
+            device_id=self._device_id,
+            size=self._buffer.maxlen,
+            entries=self.entries(),
+        )